@@ -1,25 +1,220 @@
-from polygon import RESTClient
+import asyncio
+import random
+import aiohttp
+import msgspec
 from dynaconf import Dynaconf
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import reduce
+from pathlib import Path
+from operator import attrgetter
 import time
+import numpy as np
 import pandas as pd
 from src.utils.path_utils import get_project_root
 
 settings = Dynaconf(settings_files=['settings.json', '.secrets.json'])
 
+POLYGON_BASE_URL = 'https://api.polygon.io'
+EXCHANGE_TIMEZONE = 'America/New_York'
+INTRADAY_TIMESPANS = {'second', 'minute', 'hour'}
+
+
+class Bar(msgspec.Struct):
+    """One aggregate bar, using Polygon's short JSON field names. `T` (ticker) is only set by grouped-daily."""
+    t: int
+    o: float
+    h: float
+    l: float
+    c: float
+    v: float
+    vw: float = float('nan')
+    n: int = 0
+    T: str = ''
+
+
+class AggsResponse(msgspec.Struct):
+    results: List[Bar] = []
+
+
+# Decodes response bodies straight into Bar structs, skipping the intermediate dicts of a generic JSON parse
+AGGS_DECODER = msgspec.json.Decoder(AggsResponse)
+
+# Bar fields mapped to (column name, dtype)
+AGG_FIELDS = {
+    'o': ('open', np.float64),
+    'h': ('high', np.float64),
+    'l': ('low', np.float64),
+    'c': ('close', np.float64),
+    'v': ('volume', np.float64),
+    'vw': ('vwap', np.float64),
+    'n': ('transactions', np.int64),
+}
+
+# Daily requests for more tickers than this use the grouped-daily endpoint (one request per day for all tickers)
+GROUPED_DAILY_MIN_TICKERS = 50
+
+# Attempts per grouped-daily day before its date is requested ticker by ticker instead
+GROUPED_DAILY_ATTEMPTS = 2
+
+# Key of a cached frame's `attrs` (persisted in its Parquet metadata) holding the (start, end) dates already requested
+# for the ticker, so ranges that came back empty, e.g. before a listing or after a delisting, are not requested again
+FETCHED_RANGE_ATTR = 'fetched_range'
+
+# Price columns are always stored as float32: the factor model reads prices as float32 by default, and seven
+# significant digits cover any quoted price. Other float columns (volume) are only downcast when every value converts
+# exactly.
+PRICE_COLUMNS = frozenset({'open', 'high', 'low', 'close', 'vwap'})
+
+# Column dtypes of the CSV cache files written before the switch to Parquet, following the same policy
+LEGACY_CSV_DTYPES = {
+    'open': np.float32,
+    'high': np.float32,
+    'low': np.float32,
+    'close': np.float32,
+    'volume': np.float64,
+    'vwap': np.float32,
+}
+
+
+def _reduce_mem(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Downcast numeric columns to the smallest dtype that holds their range.
+
+    Integer columns become int16 or int32 where their min/max fit. Price columns (`PRICE_COLUMNS`) become float32.
+    Other float columns become float32 only if every value survives the conversion exactly, so counts such as volumes
+    above 2**24 stay float64.
+
+    Args:
+        df (pd.DataFrame): Frame to downcast.
+
+    Returns:
+        pd.DataFrame: The downcast frame.
+    """
+    dtypes = {}
+    for col in df.columns:
+        series = df[col]
+        if series.empty:
+            continue
+        if pd.api.types.is_integer_dtype(series.dtype):
+            col_min, col_max = series.min(), series.max()
+            for dtype in (np.int16, np.int32):
+                info = np.iinfo(dtype)
+                if info.min <= col_min and col_max <= info.max:
+                    dtypes[col] = dtype
+                    break
+        elif pd.api.types.is_float_dtype(series.dtype):
+            values = series.to_numpy()
+            if col in PRICE_COLUMNS or np.array_equal(values.astype(np.float32), values, equal_nan=True):
+                dtypes[col] = np.float32
+    return df.astype(dtypes) if dtypes else df
+
+
+def _business_day_runs(dates: List[str]) -> List[Tuple[str, str]]:
+    """Group sorted 'YYYY-MM-DD' business dates into (first, last) runs of consecutive business days."""
+    runs = []
+    for date in dates:
+        if runs and pd.Timestamp(date) == pd.Timestamp(runs[-1][1]) + pd.offsets.BDay():
+            runs[-1] = (runs[-1][0], date)
+        else:
+            runs.append((date, date))
+    return runs
+
+
+def _merge_bars(cached: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """Combine two frames of bars in time order, keeping the newer row where both have the same timestamp."""
+    merged = pd.concat([cached, new])
+    return merged[~merged.index.duplicated(keep='last')].sort_index()
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter for Polygon requests.
+
+    Tokens refill continuously at `rate` requests per `period` seconds and are re-synchronised from the
+    `X-RateLimit-*` response headers whenever the API sends them, so throughput follows the plan's real ceiling rather
+    than a fixed guess. Responses with HTTP 429 are retried with exponential backoff.
+    """
+
+    def __init__(self, rate: int = 5, period: float = 60.0, max_concurrency: int = 16, max_retries: int = 5):
+        self.capacity = float(rate)
+        self.period = period
+        self.tokens = float(rate)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._last_refill = time.monotonic()
+        self._reset_at = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def get(self, session: aiohttp.ClientSession, url: str, params: dict) -> bytes:
+        """Issue a rate-limited GET request and return the raw response body."""
+        self._bind_loop()
+        for attempt in range(self.max_retries + 1):
+            await self._acquire()
+            async with self._semaphore:
+                async with session.get(url, params=params) as resp:
+                    self.update(resp.headers)
+                    if resp.status != 429 or attempt == self.max_retries:
+                        resp.raise_for_status()
+                        return await resp.read()
+            await asyncio.sleep(2 ** attempt + random.random())
+
+    def update(self, headers) -> None:
+        """Re-synchronise the bucket from `X-RateLimit-Limit`, `-Remaining` and `-Reset` headers."""
+        limit = headers.get('X-RateLimit-Limit')
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        if limit is not None:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self._refill()
+            self.tokens = min(float(remaining), self.capacity)
+        if reset is not None and self.tokens < 1:
+            self._reset_at = float(reset)
+
+    async def _acquire(self) -> None:
+        async with self._lock:
+            while True:
+                wait = self._reset_at - time.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    self.tokens = self.capacity
+                    self._last_refill = time.monotonic()
+                self._reset_at = 0.0
+
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) * self.period / self.capacity)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last_refill) * self.capacity / self.period)
+        self._last_refill = now
+
+    def _bind_loop(self) -> None:
+        # asyncio primitives belong to the loop that first waits on them, and every `asyncio.run` starts a new one.
+        # The token state itself is kept, so the budget carries over between fetches.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
 
 class DataFetcher:
-    def __init__(self, mode: str = 'on_demand'):
-        self.client = RESTClient(api_key=settings.POLYGON_API_KEY)
+    def __init__(self, mode: str = 'on_demand', max_concurrency: int = 16):
+        self.api_key = settings.POLYGON_API_KEY
         self.mode = mode
         self.data_dir = get_project_root() / 'src' / 'data' / 'data_download'
         if self.mode == 'persistent':
             self.data_dir.mkdir(exist_ok=True)
-        self.rate_limit = 5 / 60
-        self.last_request_time = 0
-        self.request_count = 0
-        self.last_reset_time = time.time()
+        self.rate_limiter = RateLimiter(rate=settings.get('POLYGON_RATE_LIMIT', 5), max_concurrency=max_concurrency)
 
     def fetch_historical_data(
             self,
@@ -28,7 +223,8 @@ class DataFetcher:
             end_date: str,
             timespan: str = 'day',
             limit: int = 50000,
-            adjusted: bool = True
+            adjusted: bool = True,
+            columns: Optional[List[str]] = None
     ) -> Dict[str, pd.DataFrame]:
         """
         Fetch historical data for multiple tickers from Polygon API.
@@ -40,6 +236,8 @@ class DataFetcher:
             timespan (str): The timespan to use for the data (e.g., 'day', 'hour', 'minute').
             limit (int): The maximum number of base aggregates to return.
             adjusted (bool): Whether to use adjusted data.
+            columns (Optional[List[str]]): Subset of columns to return, e.g. ['close']. Cached files are read with
+                only these columns; newly fetched data is still saved in full.
 
         Returns:
             Dict[str, Any]: A dictionary containing historical data for each ticker.
@@ -47,55 +245,299 @@ class DataFetcher:
         historical_data = {}
 
         if self.mode == 'persistent':
-            # Read all CSV files in the data directory
-            for csv_file in self.data_dir.glob('*.csv'):
-                ticker = csv_file.stem  # Get filename without extension
-                df = pd.read_csv(csv_file, parse_dates=['timestamp'])
-                df.set_index('timestamp', inplace=True)
-                historical_data[ticker] = df
-                print(f'Loaded data for {ticker} from file')
+            historical_data.update(self._load_cached_tickers(columns))
+
+            # Cached tickers that stop short of either end of the range only get the missing dates fetched
+            for (gap_start, gap_end), gap_tickers in self._find_cache_gaps(historical_data, tickers, start_date,
+                                                                           end_date).items():
+                gap_data = {}
+                asyncio.run(self._fetch_and_save_tickers(gap_tickers, gap_start, gap_end, timespan, limit, adjusted,
+                                                         gap_data))
+                for ticker, df in gap_data.items():
+                    historical_data[ticker] = _merge_bars(historical_data[ticker],
+                                                          df if columns is None else df[columns])
 
             # Fetch data for tickers not present in the directory
             missing_tickers = set(tickers) - set(historical_data.keys())
-            self._fetch_and_save_tickers(missing_tickers, start_date, end_date, timespan, limit, adjusted,
-                                         historical_data)
+            fetched_data = {}
+            asyncio.run(self._fetch_and_save_tickers(missing_tickers, start_date, end_date, timespan, limit, adjusted,
+                                                     fetched_data))
         else:
             # On-demand mode: fetch data for all requested tickers
-            self._fetch_and_save_tickers(tickers, start_date, end_date, timespan, limit, adjusted, historical_data)
+            fetched_data = historical_data
+            asyncio.run(self._fetch_and_save_tickers(tickers, start_date, end_date, timespan, limit, adjusted,
+                                                     fetched_data))
+
+        if columns is not None:
+            fetched_data = {ticker: df[columns] for ticker, df in fetched_data.items()}
+        historical_data.update(fetched_data)
         return historical_data
 
-    def _fetch_and_save_tickers(self, tickers, start_date, end_date, timespan, limit, adjusted, historical_data):
+    @staticmethod
+    def _find_cache_gaps(cached: Dict[str, pd.DataFrame], tickers: List[str], start_date: str,
+                         end_date: str) -> Dict[Tuple[str, str], List[str]]:
+        """
+        Find the date ranges that cached tickers are missing at either end of [start_date, end_date].
+
+        A ticker's covered range is its first to last cached bar, widened to the range stored under
+        `FETCHED_RANGE_ATTR`, so dates that were already requested and returned no bars are not gaps.
+
+        Args:
+            cached (Dict[str, pd.DataFrame]): Data loaded from the cache.
+            tickers (List[str]): Requested tickers; cached tickers that were not requested are left alone.
+            start_date (str): Start date in 'YYYY-MM-DD' format.
+            end_date (str): End date in 'YYYY-MM-DD' format.
+
+        Returns:
+            Dict[Tuple[str, str], List[str]]: Tickers grouped by the (start, end) range they need fetched.
+        """
+        # Compare against business days so that weekend start/end dates do not count as gaps
+        first_day = pd.offsets.BDay().rollforward(pd.Timestamp(start_date))
+        last_day = pd.offsets.BDay().rollback(pd.Timestamp(end_date))
+        one_day = pd.Timedelta(days=1)
+
+        gaps = defaultdict(list)
         for ticker in tickers:
+            df = cached.get(ticker)
+            if df is None or df.empty:
+                continue
+            first_cached, last_cached = df.index.min().normalize(), df.index.max().normalize()
+            if FETCHED_RANGE_ATTR in df.attrs:
+                fetched_start, fetched_end = map(pd.Timestamp, df.attrs[FETCHED_RANGE_ATTR])
+                first_cached, last_cached = min(first_cached, fetched_start), max(last_cached, fetched_end)
+            if first_cached > first_day:
+                gaps[(start_date, (first_cached - one_day).strftime('%Y-%m-%d'))].append(ticker)
+            if last_cached < last_day:
+                gaps[((last_cached + one_day).strftime('%Y-%m-%d'), end_date)].append(ticker)
+        return dict(gaps)
+
+    def _load_cached_tickers(self, columns: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Load every cached ticker in the data directory, reading files concurrently on a thread pool.
+
+        Args:
+            columns (Optional[List[str]]): Subset of columns to read.
+
+        Returns:
+            Dict[str, pd.DataFrame]: Cached data keyed by ticker.
+        """
+        parquet_files = list(self.data_dir.glob('*.parquet'))
+        cached_tickers = {parquet_file.stem for parquet_file in parquet_files}
+        legacy_files = [csv_file for csv_file in self.data_dir.glob('*.csv') if csv_file.stem not in cached_tickers]
+        files = parquet_files + legacy_files
+        if not files:
+            return {}
+
+        # Arrow and the C CSV parser release the GIL, so threads overlap both the disk reads and the decoding
+        with ThreadPoolExecutor(max_workers=min(16, len(files))) as executor:
+            return dict(executor.map(lambda path: self._load_cached_file(path, columns), files))
+
+    def _load_cached_file(self, path: Path, columns: Optional[List[str]]) -> Tuple[str, pd.DataFrame]:
+        ticker = path.stem  # Get filename without extension
+        if path.suffix == '.parquet':
+            df = _reduce_mem(pd.read_parquet(path, columns=columns))
+            print(f'Loaded data for {ticker} from file')
+        else:
+            # Migrate CSV files left by older versions to Parquet, so they are only parsed once
+            df = _reduce_mem(self._read_legacy_csv(path))
+            df.to_parquet(path.with_suffix('.parquet'), compression='snappy')
+            if columns is not None:
+                df = df[columns]
+            print(f'Loaded data for {ticker} from legacy CSV file')
+        return ticker, df
+
+    @staticmethod
+    def _read_legacy_csv(csv_file: Path) -> pd.DataFrame:
+        """Read a CSV cache file with explicit dtypes and the C parser's ISO 8601 date fast path."""
+        return pd.read_csv(
+            csv_file,
+            dtype=LEGACY_CSV_DTYPES,
+            parse_dates=['timestamp'],
+            date_format='ISO8601',
+            index_col='timestamp',
+            memory_map=True,
+            engine='c'
+        )
+
+    async def _fetch_and_save_tickers(self, tickers, start_date, end_date, timespan, limit, adjusted,
+                                      historical_data):
+        """
+        Fetch all tickers concurrently over one shared HTTP session.
+
+        Daily data for more than `GROUPED_DAILY_MIN_TICKERS` tickers is taken from the grouped-daily endpoint, one
+        request per trading day for the whole market. Days that still fail after `GROUPED_DAILY_ATTEMPTS` are fetched
+        from each ticker's own aggregates, one request per run of consecutive failed days; otherwise each ticker is
+        requested separately. The rate limiter bounds how many requests are in flight at once. In persistent mode the
+        fetched frames are handed to a single writer task through a queue, so files are never written concurrently.
+        """
+        tickers = list(tickers)
+        write_queue: asyncio.Queue = asyncio.Queue()
+        writer = asyncio.create_task(self._write_worker(write_queue))
+
+        async def save(ticker: str, df: Optional[pd.DataFrame], complete: bool = True) -> Optional[pd.DataFrame]:
+            # Only a complete fetch marks [start_date, end_date] as fetched; a partial one just stores its bars
+            fetched_range = (start_date, end_date) if complete else (None, None)
+            if df is None or df.empty:
+                print(f'No data fetched for {ticker}')
+                if self.mode == 'persistent' and complete:
+                    await write_queue.put((ticker, None, *fetched_range))  # still record the range as fetched
+                return None
+
+            df = _reduce_mem(df)
+
+            if self.mode == 'persistent':
+                await write_queue.put((ticker, df, *fetched_range))
+
+            print(f'Successfully fetched data for {ticker}')
+            return df
+
+        async def fetch_one(session: aiohttp.ClientSession, ticker: str) -> Optional[pd.DataFrame]:
             try:
-                df = self._fetch_ticker_data(ticker, start_date, end_date, timespan, limit, adjusted)
+                df = await self._fetch_ticker_data(session, ticker, start_date, end_date, timespan, limit, adjusted)
+            except Exception as e:
+                print(f'Error fetching data for {ticker}: {str(e)}')
+                return None
+            return await save(ticker, df)
 
-                if df.empty:
-                    print(f'No data fetched for {ticker}')
+        async def fill_one(session: aiohttp.ClientSession, ticker: str, df: Optional[pd.DataFrame],
+                           failed_runs: List[Tuple[str, str]]) -> Optional[pd.DataFrame]:
+            # Days the grouped-daily endpoint kept failing on are requested from the ticker's own aggregates instead.
+            # If that fails too, the bars of the good days are still returned, but the range is not marked as fetched
+            frames = [] if df is None else [df]
+            complete = True
+            for run_start, run_end in failed_runs:
+                try:
+                    gap = await self._fetch_ticker_data(session, ticker, run_start, run_end, timespan, limit, adjusted)
+                except Exception as e:
+                    print(f'Error fetching data for {ticker}: {str(e)}')
+                    complete = False
                     continue
+                if not gap.empty:
+                    frames.append(gap)
+            return await save(ticker, reduce(_merge_bars, frames) if frames else None, complete)
 
-                if self.mode == 'persistent':
-                    df.to_csv(self.data_dir / f'{ticker}.csv')
+        try:
+            # One pooled connector for the whole batch: sockets (and their TLS sessions) are kept alive and reused
+            connector = aiohttp.TCPConnector(limit=self.rate_limiter.max_concurrency, keepalive_timeout=60,
+                                             ttl_dns_cache=300)
+            async with aiohttp.ClientSession(base_url=POLYGON_BASE_URL, connector=connector,
+                                             timeout=aiohttp.ClientTimeout(total=30)) as session:
+                if timespan == 'day' and len(tickers) > GROUPED_DAILY_MIN_TICKERS:
+                    frames, failed_dates = await self._fetch_grouped_daily_range(session, tickers, start_date,
+                                                                                 end_date, adjusted)
+                    failed_runs = _business_day_runs(failed_dates)
+                    results = await asyncio.gather(*(fill_one(session, ticker, frames.get(ticker), failed_runs)
+                                                     for ticker in tickers))
+                else:
+                    results = await asyncio.gather(*(fetch_one(session, ticker) for ticker in tickers))
+        finally:
+            await write_queue.put(None)
+            await writer
 
+        # Insert in request order rather than completion order
+        for ticker, df in zip(tickers, results):
+            if df is not None:
                 historical_data[ticker] = df
-                print(f'Successfully fetched data for {ticker}')
+
+    async def _fetch_grouped_daily_range(self, session: aiohttp.ClientSession, tickers: List[str], start_date: str,
+                                         end_date: str, adjusted: bool) -> Tuple[Dict[str, pd.DataFrame], List[str]]:
+        """
+        Fetch daily bars for many tickers with one grouped-daily request per weekday in the range.
+
+        A failed day does not discard the others. Failed days are retried, up to `GROUPED_DAILY_ATTEMPTS` in all, and
+        the dates that still fail are reported back so the caller can request them per ticker.
+
+        Returns:
+            Tuple[Dict[str, pd.DataFrame], List[str]]: Bars of the requested tickers, split into one frame per ticker,
+            and the sorted dates whose grouped-daily request failed on every attempt.
+        """
+        failed_dates = list(pd.bdate_range(start_date, end_date).strftime('%Y-%m-%d'))
+        days = []
+        for _ in range(GROUPED_DAILY_ATTEMPTS):
+            if not failed_dates:
+                break
+            results = await asyncio.gather(*(self._fetch_grouped_daily(session, date, adjusted)
+                                             for date in failed_dates), return_exceptions=True)
+            pending, failed_dates = failed_dates, []
+            for date, day in zip(pending, results):
+                if isinstance(day, BaseException):
+                    print(f'Error fetching grouped daily data for {date}: {str(day)}')
+                    failed_dates.append(date)
+                else:
+                    days.append(day)
+
+        wanted = set(tickers)
+        bars = [bar for day in days for bar in day if bar.T in wanted]
+        frame = self._bars_to_frame(bars)
+        symbols = np.array([bar.T for bar in bars], dtype=object)
+        return {ticker: df for ticker, df in frame.groupby(symbols, sort=False)}, failed_dates
+
+    async def _fetch_grouped_daily(self, session: aiohttp.ClientSession, date: str, adjusted: bool) -> List[Bar]:
+        """
+        Request the daily bars of every US stock for one date from Polygon's grouped-daily endpoint.
+
+        Returns:
+            List[Bar]: The decoded `results` records; `T` holds each record's ticker. Empty on market holidays.
+        """
+        params = {
+            'adjusted': str(adjusted).lower(),
+            'apiKey': self.api_key
+        }
+        url = f'/v2/aggs/grouped/locale/us/market/stocks/{date}'
+        body = await self.rate_limiter.get(session, url, params)
+        return AGGS_DECODER.decode(body).results
+
+    async def _write_worker(self, write_queue: asyncio.Queue):
+        while (item := await write_queue.get()) is not None:
+            ticker, df, start_date, end_date = item
+            try:
+                await asyncio.to_thread(self._write_cache_file, ticker, df, start_date, end_date)
             except Exception as e:
-                print(f'Error fetching data for {ticker}: {str(e)}')
+                print(f'Error saving data for {ticker}: {str(e)}')
+
+    def _write_cache_file(self, ticker: str, df: Optional[pd.DataFrame], start_date: Optional[str],
+                          end_date: Optional[str]):
+        """
+        Save `df` to the ticker's cache file, merging it with the bars already stored there.
+
+        The stored fetched range is widened by [start_date, end_date] even when `df` is None (nothing came back), as
+        long as the ticker already has a cache file. Fetched gaps always adjoin the cached range, so the union stays
+        contiguous. With no dates (a partial fetch) the bars are saved and the stored range is left as it was.
+        """
+        path = self.data_dir / f'{ticker}.parquet'
+        fetched_range = None if start_date is None else (start_date, end_date)
+        if path.exists():
+            cached = pd.read_parquet(path)
+            cached_range = cached.attrs.get(FETCHED_RANGE_ATTR)
+            if cached_range is None and not cached.empty:
+                cached_range = (cached.index.min().strftime('%Y-%m-%d'), cached.index.max().strftime('%Y-%m-%d'))
+            if fetched_range is None:
+                fetched_range = cached_range
+            elif cached_range is not None:
+                fetched_range = (min(start_date, cached_range[0]), max(end_date, cached_range[1]))
+            df = cached if df is None else _merge_bars(cached, df)
+        elif df is None:
+            return
+        if fetched_range is None:
+            df.attrs.pop(FETCHED_RANGE_ATTR, None)
+        else:
+            df.attrs[FETCHED_RANGE_ATTR] = tuple(fetched_range)
+        df.to_parquet(path, compression='snappy')
 
-    def _fetch_ticker_data(self, ticker, start_date, end_date, timespan, limit, adjusted):
+    async def _fetch_ticker_data(self, session, ticker, start_date, end_date, timespan, limit, adjusted):
         start = datetime.strptime(start_date, '%Y-%m-%d')
         end = datetime.strptime(end_date, '%Y-%m-%d')
         chunk_size = timedelta(days=365)  # Fetch data in 1-year chunks
 
-        all_data = []
+        bars = []
         current_start = start
 
-        while current_start < end:
+        while current_start <= end:
             current_end = min(current_start + chunk_size, end)
 
-            self._rate_limit()  # Apply rate limiting b/f each request
-            aggs = self.client.get_aggs(
+            aggs = await self._get_aggs(
+                session,
                 ticker=ticker,
-                multiplier=1,
                 timespan=timespan,
                 from_=current_start.strftime('%Y-%m-%d'),
                 to=current_end.strftime('%Y-%m-%d'),
@@ -103,58 +545,54 @@ class DataFetcher:
                 adjusted=adjusted
             )
 
-            chunk_data = pd.DataFrame([
-                {
-                    'timestamp': self._convert_timestamp_to_date(bar.timestamp),
-                    'open': bar.open,
-                    'high': bar.high,
-                    'low': bar.low,
-                    'close': bar.close,
-                    'volume': bar.volume,
-                    'vwap': bar.vwap,
-                    'transactions': bar.transactions
-                }
-                for bar in aggs
-            ])
-
-            all_data.append(chunk_data)
+            bars.extend(aggs)
             current_start = current_end + timedelta(days=1)
 
-        if all_data:
-            df = pd.concat(all_data)
-            df.set_index('timestamp', inplace=True)
-            return df
+        # Build one frame from every chunk's bars rather than a frame per chunk joined with pd.concat
+        if bars:
+            return self._bars_to_frame(bars, timespan)
         else:
             return pd.DataFrame()
 
-    def _rate_limit(self):
-        current_time = time.time()
-
-        # Reset counter if a minute has passed
-        if current_time - self.last_reset_time >= 60:
-            self.request_count = 0
-            self.last_reset_time = current_time
-
-        # If we've made 5 requests in the last minute, wait
-        if self.request_count >= 5:
-            sleep_time = 60 - (current_time - self.last_reset_time)
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-            self.request_count = 0
-            self.last_reset_time = time.time()
+    @staticmethod
+    def _bars_to_frame(aggs: List[Bar], timespan: str = 'day') -> pd.DataFrame:
+        """
+        Build a DataFrame from raw aggregate bars one column at a time.
 
-        # Increment request count and update last request time
-        self.request_count += 1
-        self.last_request_time = time.time()
+        Args:
+            aggs (List[Bar]): Decoded bars from the `results` field of an aggregates response.
+            timespan (str): The timespan of the bars. Daily and coarser bars are indexed by their session date.
 
-    def _convert_timestamp_to_date(self, timestamp: int) -> str:
+        Returns:
+            pd.DataFrame: OHLCV frame indexed by a `DatetimeIndex` named 'timestamp', in exchange (New York) time.
         """
-        Convert Unix timestamp to date string.
+        count = len(aggs)
+        timestamps = np.fromiter(map(attrgetter('t'), aggs), dtype=np.int64, count=count)
+        columns = {
+            name: np.fromiter(map(attrgetter(field), aggs), dtype=dtype, count=count)
+            for field, (name, dtype) in AGG_FIELDS.items()
+        }
+        # Polygon stamps bars in UTC milliseconds; daily bars start at midnight New York time (04:00/05:00 UTC)
+        index = pd.to_datetime(timestamps, unit='ms', utc=True).tz_convert(EXCHANGE_TIMEZONE).tz_localize(None)
+        if timespan not in INTRADAY_TIMESPANS:
+            index = index.normalize()
+        index.name = 'timestamp'
+        return pd.DataFrame(columns, index=index)
 
-        Args:
-            timestamp (int): Unix timestamp in milliseconds.
+    async def _get_aggs(self, session: aiohttp.ClientSession, ticker: str, timespan: str, from_: str, to: str,
+                        limit: int, adjusted: bool) -> List[Bar]:
+        """
+        Request one range of aggregate bars from Polygon's aggregates endpoint.
 
         Returns:
-            str: Date string in 'YYYY-MM-DD' format.
+            List[Bar]: The decoded `results` records.
         """
-        return datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d')
+        params = {
+            'adjusted': str(adjusted).lower(),
+            'sort': 'asc',
+            'limit': limit,
+            'apiKey': self.api_key
+        }
+        url = f'/v2/aggs/ticker/{ticker}/range/1/{timespan}/{from_}/{to}'
+        body = await self.rate_limiter.get(session, url, params)
+        return AGGS_DECODER.decode(body).results
@@ -1,28 +1,32 @@
 import numpy as np
 import pandas as pd
-from typing import List, Dict
-from sklearn.linear_model import LinearRegression
-from pathlib import Path
-import sys
-from src.utils.data_preparation import load_snp_constituents
+from typing import List, Dict, Optional, Tuple, Union
+import warnings
+from src.utils.data_preparation import load_snp_constituents, PriceMatrix
+from src.utils._njit import njit, prange, NUMBA_AVAILABLE
 from loguru import logger
-from sklearn.impute import SimpleImputer
-from sklearn.linear_model import LinearRegression
 
-# Add the project root to the Python path
-sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+MOMENTUM_LOOKBACK = 252  # trading days
 
 
 class FactorModel:
-    def __init__(self, factors: List[str], benchmark_ticker: str = "SPY"):
+    def __init__(self, factors: List[str], benchmark_ticker: str = "SPY", fp32: bool = True):
         self.factors = factors
         self.factor_exposures = None
         self.factor_returns = None
         self.benchmark_ticker = benchmark_ticker
+        # Daily returns carry far fewer significant digits than float32 holds; float32 halves the memory traffic
+        # and lets NumPy use single-precision BLAS. Pass fp32=False to run everything in float64.
+        self.dtype = np.float32 if fp32 else np.float64
         self.snp_weights, _ = load_snp_constituents()
+        # (data, tickers, close prices, returns) for the last dict passed to _prepare_returns
+        self._returns_cache: Optional[tuple] = None
+        # Per-ticker (count, Σr, Σm, Σr·m, Σm²) over the current rolling window, see update_window
+        self._window_sums: Optional[np.ndarray] = None
         logger.info(f"Loaded {len(self.factors)} factors")
 
-    def construct_portfolio(self, data: Dict[str, pd.DataFrame], target_exposures: Dict[str, float]) -> pd.Series:
+    def construct_portfolio(self, data: Union[Dict[str, pd.DataFrame], PriceMatrix],
+                            target_exposures: Dict[str, float]) -> pd.Series:
         logger.info("Constructing portfolio...")
         if self.factor_exposures is None:
             logger.warning("Factor exposures not calculated. Calculating now...")
@@ -36,130 +40,337 @@ class FactorModel:
 
         stock_tickers = [ticker for ticker in self.factor_exposures.index if ticker != self.benchmark_ticker]
 
-        # Convert target exposures to Series
-        target = pd.Series(target_exposures)
-
         # Simple portfolio construction: maximize expected return subject to target factor exposures
-        portfolio = pd.Series(0, index=stock_tickers)
-        remaining_budget = 1.0
-
+        factors = [factor for factor in self.factors if factor in self.factor_exposures.columns]
         for factor in self.factors:
-            if factor in self.factor_exposures.columns:
-                factor_portfolio = self.factor_exposures.loc[stock_tickers, factor] * target[factor]
-                factor_sum = factor_portfolio.abs().sum()
-
-                if factor_sum > 0:
-                    factor_portfolio = factor_portfolio / factor_sum
-                    allocation = min(remaining_budget, abs(target[factor]))
-                    portfolio += factor_portfolio * allocation
-                    remaining_budget -= allocation
-                else:
-                    logger.warning(f"Unable to allocate to {factor} factor due to zero sum of exposures.")
-            else:
+            if factor not in self.factor_exposures.columns:
                 logger.warning(f"Factor {factor} not found in factor exposures.")
 
-        # Normalize weights to sum to 1, ignoring NaN values
-        portfolio = portfolio.fillna(0)
-        portfolio_sum = portfolio.abs().sum()
-        if portfolio_sum > 0:
-            portfolio = portfolio / portfolio_sum
-        else:
+        exposures = self.factor_exposures.loc[stock_tickers, factors].to_numpy(dtype=np.float64)
+        target = np.array([target_exposures[factor] for factor in factors], dtype=np.float64)
+        allocate = _allocate if NUMBA_AVAILABLE else _allocate_numpy
+        portfolio, allocated = allocate(exposures, target)
+
+        for factor, ok in zip(factors, allocated):
+            if not ok:
+                logger.warning(f"Unable to allocate to {factor} factor due to zero sum of exposures.")
+
+        if not portfolio.any():
             logger.warning("Unable to construct portfolio due to zero sum of weights.")
             return pd.Series(0, index=stock_tickers)
 
-        return portfolio
+        return pd.Series(portfolio, index=stock_tickers)
 
-    def calculate_factor_exposures(self, data: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    def calculate_factor_exposures(self, data: Union[Dict[str, pd.DataFrame], PriceMatrix]) -> pd.DataFrame:
         logger.info("Calculating factor exposures...")
-        # Exclude the benchmark from calculations
-        df = pd.DataFrame({ticker: data[ticker]['close'] for ticker in data if ticker != self.benchmark_ticker})
+        df, returns = self._prepare_returns(data)
         logger.info(f"Data shape: {df.shape}")
+        logger.info(f"Returns shape: {returns.shape}")
+        return self._fit_exposures(df.to_numpy(), returns.to_numpy(), df.columns)
 
-        returns = df.pct_change(fill_method=None)
-        logger.info(f"Returns shape before dropna: {returns.shape}")
-
-        # Instead of filling NaN with 0, we'll drop rows with any NaN values
-        returns = returns.dropna(how='any')
-        logger.info(f"Returns shape after dropna: {returns.shape}")
-
-        market_returns = returns.mean(axis=1)
-        logger.info(f"Market returns shape: {market_returns.shape}")
-
-        exposures = pd.DataFrame(index=df.columns, columns=self.factors)
-
-        for ticker in df.columns:
-            ticker_returns = returns[ticker]
-            if ticker_returns.notna().sum() > 1 and market_returns.notna().sum() > 1:
-                cov_matrix = np.cov(ticker_returns, market_returns)
-                if cov_matrix.shape == (2, 2):
-                    market_var = np.var(market_returns)
-                    if market_var != 0:
-                        exposures.loc[ticker, 'Market'] = cov_matrix[0, 1] / market_var
-                    else:
-                        exposures.loc[ticker, 'Market'] = np.nan
-                else:
-                    exposures.loc[ticker, 'Market'] = np.nan
-            else:
-                exposures.loc[ticker, 'Market'] = np.nan
-
-            if not df[ticker].empty:
-                last_price = df[ticker].iloc[-1]
-                exposures.loc[ticker, 'Size'] = np.log(last_price) if last_price > 0 else np.nan
-                exposures.loc[ticker, 'Value'] = 1 / last_price if last_price != 0 else np.nan
-
-                if len(df) >= 2:
-                    start_price = df[ticker].iloc[0]
-                    exposures.loc[ticker, 'Momentum'] = (last_price / start_price) - 1 if start_price != 0 else np.nan
-                else:
-                    exposures.loc[ticker, 'Momentum'] = np.nan
-            else:
-                exposures.loc[ticker, ['Size', 'Value', 'Momentum']] = np.nan
+    def estimate_factor_returns(self, data: Union[Dict[str, pd.DataFrame], PriceMatrix]) -> pd.DataFrame:
+        logger.info("Estimating factor returns...")
+        _, returns = self._prepare_returns(data)
 
-        # Replace infinity values with NaN
-        exposures = exposures.replace([np.inf, -np.inf], np.nan)
+        if self.factor_exposures is None:
+            self.calculate_factor_exposures(data)
 
-        # Drop any rows with NaN values
-        exposures = exposures.dropna(how='any')
+        return self._fit_factor_returns(returns.to_numpy(), returns.index, returns.columns)
+
+    def fit_window(self, prices: PriceMatrix, returns: np.ndarray, betas: Optional[np.ndarray] = None,
+                   market: Optional[np.ndarray] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Calculate factor exposures and estimate factor returns for one window of precomputed returns.
+
+        Unlike calculate_factor_exposures/estimate_factor_returns this never builds price or return DataFrames, so a
+        backtest can compute returns once for the whole sample and pass each window as a row slice.
+
+        Args:
+            prices (PriceMatrix): Close prices of the window, without the benchmark.
+            returns (np.ndarray): Simple returns for the same rows and tickers as `prices`.
+            betas (Optional[np.ndarray]): Market betas of the window, e.g. from update_window. Computed from
+                `returns` if not given.
+            market (Optional[np.ndarray]): Market returns of the window's rows, from market_returns. Only used when
+                `betas` is not given; computed from `returns` if not given either.
+
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: Factor exposures and factor returns, also stored on the model.
+        """
+        tickers = pd.Index(prices.tickers)
+        exposures = self._fit_exposures(prices.close, returns, tickers, betas, market)
+        factor_returns = self._fit_factor_returns(returns, prices.index, tickers)
+        return exposures, factor_returns
+
+    def reset_window(self) -> None:
+        """Forget the rolling window sums kept by update_window."""
+        self._window_sums = None
+
+    def update_window(self, new_returns: np.ndarray, old_returns: Optional[np.ndarray] = None,
+                      new_market: Optional[np.ndarray] = None, old_market: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Roll the market-beta window forward and return the beta of every ticker over the new window.
+
+        Consecutive rebalance windows share almost all of their rows, so rather than recomputing betas from scratch
+        the model keeps per-ticker sums over the window and only adds the rows entering it and subtracts the rows
+        leaving it. The result matches the masked betas of calculate_factor_exposures. Call reset_window before the
+        first window of a new sample.
+
+        Args:
+            new_returns (np.ndarray): Return rows entering the window, shape (rows, N).
+            old_returns (Optional[np.ndarray]): Return rows leaving the window, for the same N tickers.
+            new_market (Optional[np.ndarray]): Market returns of the entering rows, from market_returns. Computed
+                from `new_returns` if not given.
+            old_market (Optional[np.ndarray]): Market returns of the leaving rows, likewise.
+
+        Returns:
+            np.ndarray: Market beta of each ticker (NaN with fewer than two observations).
+        """
+        moments = self._window_moments(new_returns, new_market)
+        self._window_sums = moments if self._window_sums is None else self._window_sums + moments
+        if old_returns is not None and len(old_returns) > 0:
+            self._window_sums -= self._window_moments(old_returns, old_market)
+
+        count, sum_r, sum_m, sum_rm, sum_mm = self._window_sums
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = sum_rm - sum_r * sum_m / count
+            market_ss = sum_mm - sum_m * sum_m / count
+            betas = np.where((count > 1) & (market_ss > 0), cov / market_ss, np.nan)
+        return betas.astype(self.dtype)
+
+    @staticmethod
+    def market_returns(returns: np.ndarray) -> np.ndarray:
+        """
+        Market return of each row of a (T, N) return array: the mean over the tickers that have a return that day.
+
+        Compute this once per sample and pass slices of it to update_window rather than recomputing it per window.
+        """
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)  # all-NaN rows in nanmean
+            return np.nanmean(np.asarray(returns, dtype=np.float64), axis=1)
+
+    @classmethod
+    def _window_moments(cls, returns: np.ndarray, market: Optional[np.ndarray] = None) -> np.ndarray:
+        """Per-ticker (count, Σr, Σm, Σr·m, Σm²) over rows where both the ticker and the market have a return."""
+        # Accumulate in float64: the sums are differenced across many window updates
+        R = np.asarray(returns, dtype=np.float64)
+        m = (cls.market_returns(R) if market is None else np.asarray(market, dtype=np.float64))[:, None]
+        mask = ~np.isnan(R) & ~np.isnan(m)
+        R_masked = np.where(mask, R, 0)
+        M_masked = np.where(mask, m, 0)
+        return np.stack([mask.sum(axis=0), R_masked.sum(axis=0), M_masked.sum(axis=0),
+                         np.einsum('ij,ij->j', R_masked, M_masked), np.einsum('ij,ij->j', M_masked, M_masked)])
+
+    def _fit_exposures(self, prices: np.ndarray, returns: np.ndarray, tickers: pd.Index,
+                       betas: Optional[np.ndarray] = None, market: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """
+        Factor exposures of each ticker from (T, N) close-price and return arrays.
+
+        `betas` and the `market` return vector are computed from `returns` unless the caller already has them.
+        """
+        # Row-major (T, N) so the row-wise market mean and the masked column sums below stream contiguously
+        R = np.ascontiguousarray(returns, dtype=self.dtype)
+        prices = np.ascontiguousarray(prices, dtype=self.dtype)
+        num_tickers = prices.shape[1]
+
+        # Tickers list on different dates, so rows are not dropped wholesale: each beta uses the dates where both
+        # the ticker and the market (the cross-sectional mean of whatever is trading that day) have a return
+        if betas is not None:
+            betas = np.asarray(betas, dtype=self.dtype)
+        elif len(R) <= 1:
+            betas = np.full(num_tickers, np.nan, dtype=self.dtype)
+        else:
+            m = self.market_returns(R) if market is None else np.asarray(market, dtype=np.float64)
+            if NUMBA_AVAILABLE:
+                # Ticker-major copy so each parallel worker reduces one contiguous row
+                betas = _market_betas(np.ascontiguousarray(R.T), m).astype(self.dtype)
+            else:
+                betas = _market_betas_numpy(R, m).astype(self.dtype)
+
+        # Size, Value and Momentum only need two rows of the price matrix; invalid prices are masked rather than
+        # computed and then discarded
+        size, value, momentum = (np.full(num_tickers, np.nan, dtype=self.dtype) for _ in range(3))
+        if len(prices) > 0:
+            last_price = prices[-1]
+            np.log(last_price, out=size, where=last_price > 0)
+            np.divide(1, last_price, out=value, where=last_price != 0)
+            if len(prices) >= 2:
+                # Twelve-month momentum, or since the start of the data when it covers less than a year
+                start_price = prices[max(len(prices) - MOMENTUM_LOOKBACK, 0)]
+                np.divide(last_price, start_price, out=momentum, where=start_price != 0)
+                momentum -= 1
+
+        # Fill one preallocated (N, K) float block in the order of self.factors; unknown factors stay NaN
+        computed = {'Market': betas, 'Size': size, 'Value': value, 'Momentum': momentum}
+        M = np.full((num_tickers, len(self.factors)), np.nan, dtype=self.dtype)
+        for k, factor in enumerate(self.factors):
+            if factor in computed:
+                M[:, k] = computed[factor]
+
+        # Keep only tickers with a finite exposure to every factor
+        complete = np.isfinite(M).all(axis=1)
+        exposures = pd.DataFrame(M[complete], index=tickers[complete], columns=self.factors)
 
         logger.info(f"Calculated exposures shape: {exposures.shape}")
         self.factor_exposures = exposures
         return exposures
 
-    def estimate_factor_returns(self, data: Dict[str, pd.DataFrame]) -> pd.DataFrame:
-        logger.info("Estimating factor returns...")
-        # Exclude the benchmark from calculations
-        df = pd.DataFrame({ticker: data[ticker]['close'] for ticker in data if ticker != self.benchmark_ticker})
-        returns = df.pct_change(fill_method=None).fillna(0)
-
-        if self.factor_exposures is None:
-            self.calculate_factor_exposures(data)
-
-        factor_returns = pd.DataFrame(index=returns.index, columns=self.factors)
-
+    def _fit_factor_returns(self, returns: np.ndarray, index: pd.Index, tickers: pd.Index) -> pd.DataFrame:
+        """Cross-sectional factor returns for each row of a (T, N) return array, given the current exposures."""
         # Ensure factor_exposures and returns have the same stocks
-        common_stocks = self.factor_exposures.index.intersection(returns.columns)
-        X = self.factor_exposures.loc[common_stocks]
-
-        # Create an imputer to handle NaN values
-        imputer = SimpleImputer(strategy='mean')
-
-        for date in returns.index:
-            y = returns.loc[date, common_stocks]
-
-            # Remove any remaining NaN values in y
-            valid_indices = ~np.isnan(y)
-            X_valid = X.loc[valid_indices]
-            y_valid = y[valid_indices]
-
-            if len(X_valid) > 0 and len(y_valid) > 0:
-                # Impute NaN values in X_valid
-                X_imputed = imputer.fit_transform(X_valid)
-
-                model = LinearRegression().fit(X_imputed, y_valid)
-                factor_returns.loc[date] = model.coef_
-            else:
-                factor_returns.loc[date] = np.nan
+        common_stocks = self.factor_exposures.index.intersection(tickers)
+        X = self.factor_exposures.loc[common_stocks].to_numpy(dtype=self.dtype)
+        Y = np.asarray(returns, dtype=self.dtype)[:, tickers.get_indexer(common_stocks)]
+        Y = np.where(np.isnan(Y), 0, Y)
+
+        if len(common_stocks) > 0:
+            # One cross-sectional OLS fit (with intercept) per date, solved for all dates at once. Centring X absorbs
+            # the intercept, and pinv of the centred X maps the constant vector to zero, so Y needs no centring.
+            X_pinv = np.linalg.pinv(X - X.mean(axis=0))
+            factor_returns = pd.DataFrame(Y @ X_pinv.T, index=index, columns=self.factors)
+        else:
+            factor_returns = pd.DataFrame(np.nan, index=index, columns=self.factors)
 
         self.factor_returns = factor_returns
         logger.info(f"Estimated factor returns shape: {factor_returns.shape}")
         return factor_returns
+
+    def _prepare_returns(self, data: Union[Dict[str, pd.DataFrame], PriceMatrix]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Build the close-price and simple-return frames for every non-benchmark ticker in `data`.
+
+        The last result is memoised on the identity and ticker set of `data`, so calling calculate_factor_exposures
+        and estimate_factor_returns on the same window builds the frames once. Callers must not modify them in place.
+        """
+        tickers = tuple(data.tickers) if isinstance(data, PriceMatrix) else tuple(data)
+        if self._returns_cache is not None:
+            cached_data, cached_tickers, df, returns = self._returns_cache
+            if cached_data is data and cached_tickers == tickers:
+                return df, returns
+
+        prices = data if isinstance(data, PriceMatrix) else PriceMatrix.from_frames(data, dtype=self.dtype)
+        # Exclude the benchmark from calculations
+        prices = prices.drop(self.benchmark_ticker)
+        df = prices.to_frame()
+        returns = pd.DataFrame(prices.returns(), index=df.index, columns=df.columns)
+        self._returns_cache = (data, tickers, df, returns)
+        return df, returns
+
+
+def _allocate_numpy(exposures: np.ndarray, target: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized equivalent of `_allocate`: one (N, K) scaling and a GEMV instead of per-element loops."""
+    weighted = exposures * target
+    weighted[np.isnan(weighted)] = 0
+    factor_sums = np.abs(weighted).sum(axis=0)
+    allocated = factor_sums > 0
+
+    # The budget is handed out in factor order, so only this K-length step stays sequential
+    allocations = np.zeros(len(target))
+    remaining_budget = 1.0
+    for k in np.flatnonzero(allocated):
+        allocations[k] = min(remaining_budget, abs(target[k]))
+        remaining_budget -= allocations[k]
+
+    scale = np.divide(allocations, factor_sums, out=np.zeros_like(allocations), where=allocated)
+    portfolio = weighted @ scale
+    portfolio_sum = np.abs(portfolio).sum()
+    if portfolio_sum > 0:
+        portfolio /= portfolio_sum
+    return portfolio, allocated
+
+
+@njit(cache=True)
+def _allocate(exposures: np.ndarray, target: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Allocate the budget across factors in order, then L1-normalise the weights.
+
+    Each factor's exposures, scaled by its target, are normalised to unit gross weight and receive
+    min(remaining budget, |target|) of the budget. NaN exposures contribute nothing.
+
+    Args:
+        exposures (np.ndarray): N x K exposures of each stock to each factor.
+        target (np.ndarray): Target exposure for each of the K factors.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The N portfolio weights (all zero if nothing could be allocated) and a
+            K-length flag of which factors received an allocation.
+    """
+    num_stocks, num_factors = exposures.shape
+    portfolio = np.zeros(num_stocks)
+    allocated = np.zeros(num_factors, dtype=np.bool_)
+    remaining_budget = 1.0
+
+    for k in range(num_factors):
+        factor_sum = 0.0
+        for i in range(num_stocks):
+            x = exposures[i, k]
+            if not np.isnan(x):
+                factor_sum += abs(x * target[k])
+        if factor_sum > 0:
+            allocation = min(remaining_budget, abs(target[k]))
+            for i in range(num_stocks):
+                x = exposures[i, k]
+                if not np.isnan(x):
+                    portfolio[i] += x * target[k] / factor_sum * allocation
+            remaining_budget -= allocation
+            allocated[k] = True
+
+    portfolio_sum = np.abs(portfolio).sum()
+    if portfolio_sum > 0:
+        portfolio /= portfolio_sum
+    return portfolio, allocated
+
+
+def _market_betas_numpy(returns: np.ndarray, market: np.ndarray) -> np.ndarray:
+    """Masked market betas of every column of a (T, N) return array, vectorized across tickers."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mask = ~np.isnan(returns) & ~np.isnan(market)[:, None]
+        counts = mask.sum(axis=0)
+        R_masked = np.where(mask, returns, 0)
+        M_masked = np.where(mask, market[:, None], 0)
+        # Centre ticker and market on the overlap of each ticker separately, then cov / var column-wise
+        R_centered = np.where(mask, returns - R_masked.sum(axis=0) / counts, 0)
+        M_centered = np.where(mask, market[:, None] - M_masked.sum(axis=0) / counts, 0)
+        market_ss = np.einsum('ij,ij->j', M_centered, M_centered)
+        cov = np.einsum('ij,ij->j', R_centered, M_centered)
+        return np.where((counts > 1) & (market_ss != 0), cov / market_ss, np.nan)
+
+
+@njit(parallel=True, cache=True)
+def _market_betas(returns_t: np.ndarray, market: np.ndarray) -> np.ndarray:
+    """
+    Masked market betas, one parallel task per ticker.
+
+    Each beta uses only the dates where both the ticker and the market have a return; fastmath stays off (see `_njit`).
+
+    Args:
+        returns_t (np.ndarray): (N, T) returns, one contiguous row per ticker.
+        market (np.ndarray): (T,) market returns.
+
+    Returns:
+        np.ndarray: Market beta of each ticker (NaN with fewer than two observations or a constant market).
+    """
+    num_tickers, num_rows = returns_t.shape
+    betas = np.empty(num_tickers)
+    for j in prange(num_tickers):
+        r = returns_t[j]
+        count = 0
+        sum_r = 0.0
+        sum_m = 0.0
+        for t in range(num_rows):
+            if not np.isnan(r[t]) and not np.isnan(market[t]):
+                count += 1
+                sum_r += r[t]
+                sum_m += market[t]
+
+        cov = 0.0
+        market_ss = 0.0
+        if count > 1:
+            mean_r = sum_r / count
+            mean_m = sum_m / count
+            for t in range(num_rows):
+                if not np.isnan(r[t]) and not np.isnan(market[t]):
+                    market_dev = market[t] - mean_m
+                    cov += (r[t] - mean_r) * market_dev
+                    market_ss += market_dev * market_dev
+        betas[j] = cov / market_ss if market_ss != 0 else np.nan
+    return betas
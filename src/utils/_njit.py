@@ -0,0 +1,14 @@
+# Kernels are compiled without fastmath: it lets LLVM assume that no value is NaN, which folds away the `x != x` /
+# np.isnan tests the kernels use to skip missing returns.
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba is an optional extra; kernels run as plain Python/NumPy without it
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for `numba.njit` supporting both `@njit` and `@njit(...)`."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
@@ -1,57 +1,158 @@
-from typing import Tuple, Dict
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from typing import Tuple, Dict, Union, List, Optional
+import numpy as np
 import pandas as pd
 from src.models.factor_model import FactorModel
 from src.utils import data_preparation
+from src.utils.data_preparation import PriceMatrix
 from loguru import logger
 
+TARGET_EXPOSURES = {'Market': 1.0, 'Size': -0.2, 'Value': 0.5, 'Momentum': 0.3}
+HOLDING_PERIOD = 20  # Assume 20 trading days per month
 
-def backtest_strategy(historical_data: Dict[str, pd.DataFrame],
+# Per-process state of backtest worker processes, set once by _init_worker
+_worker: Optional[tuple] = None
+
+
+def backtest_strategy(historical_data: Union[Dict[str, pd.DataFrame], PriceMatrix],
                       model: FactorModel,
                       rebalance_frequency: str,
-                      window_size: int) -> Tuple[pd.Series, pd.DataFrame]:
+                      window_size: int,
+                      n_jobs: int = 1) -> Tuple[pd.Series, pd.DataFrame]:
     """
     Implement rolling window backtesting approach.
 
     Args:
-        historical_data (Dict[str, pd.DataFrame]): Historical price data
+        historical_data (Union[Dict[str, pd.DataFrame], PriceMatrix]): Historical price data
         model (FactorModel): The factor model to use
         rebalance_frequency (str): Frequency of rebalancing (e.g., 'M' for monthly)
         window_size (int): Size of the rolling window in days
+        n_jobs (int): Number of worker processes fitting rebalance windows. With 1 (the default) windows are fitted in
+            order and market betas are rolled forward between them; with more, windows are fitted independently
+            in parallel.
 
     Returns:
         Tuple[pd.Series, pd.DataFrame]: Portfolio returns and weights over time
     """
     logger.info("Starting backtesting strategy...")
+    if not isinstance(historical_data, PriceMatrix):
+        historical_data = PriceMatrix.from_frames(historical_data, dtype=model.dtype)
     returns_data = data_preparation.prepare_returns_data(historical_data)
     logger.info(f"Returns data shape: {returns_data.shape}")
 
-    portfolio_returns = pd.Series(index=returns_data.index)
     portfolio_weights = pd.DataFrame(index=returns_data.index, columns=returns_data.columns)
 
-    benchmark_returns = returns_data[model.benchmark_ticker]
-    stock_returns = returns_data.drop(columns=[model.benchmark_ticker])
+    stock_returns = returns_data.drop(columns=[model.benchmark_ticker], errors='ignore')
+    stock_prices = historical_data.drop(model.benchmark_ticker)
+    # Returns are computed once for the whole sample; each window is a row slice of this array
+    stock_returns_array = stock_prices.returns()
 
+    # (end date, positional rows) of every rebalance window
+    windows = []
     for end_date in stock_returns.resample(rebalance_frequency).last().index:
-        logger.info(f"Processing end date: {end_date}")
         start_date = end_date - pd.Timedelta(days=window_size)
-        window_data = {ticker: historical_data[ticker].loc[start_date:end_date]
-                       for ticker in historical_data if ticker != model.benchmark_ticker}
-        logger.info(f"Window data size: {len(window_data)}")
-
-        model.calculate_factor_exposures(window_data)
-        model.estimate_factor_returns(window_data)
+        windows.append((end_date, stock_prices.index.slice_indexer(start_date, end_date)))
 
-        target_exposures = {'Market': 1.0, 'Size': -0.2, 'Value': 0.5, 'Momentum': 0.3}
-        weights = model.construct_portfolio(window_data, target_exposures)
+    if n_jobs > 1:
+        all_weights = _fit_windows_parallel(stock_prices, stock_returns_array, model, windows, n_jobs)
+        # Leave the model fitted on the last window, as the sequential path does
+        if windows:
+            last_rows = windows[-1][1]
+            model.fit_window(stock_prices.take(last_rows), stock_returns_array[last_rows])
+    else:
+        all_weights = _fit_windows_rolling(stock_prices, stock_returns_array, model, windows)
 
+    for (end_date, _), weights in zip(windows, all_weights):
         logger.info(f"Calculated weights shape: {weights.shape}")
-
         portfolio_weights.loc[end_date, weights.index] = weights
-        future_returns = stock_returns.loc[end_date:].iloc[:20]  # Assume 20 trading days per month
-        portfolio_returns.loc[end_date:] = (future_returns * weights).sum(axis=1)
 
-    portfolio_returns = portfolio_returns.astype(float)
+    portfolio_returns = _apply_weights(stock_returns, [end_date for end_date, _ in windows], all_weights)
     portfolio_weights = portfolio_weights.astype(float)
 
     logger.info("Backtesting strategy completed.")
     return portfolio_returns.dropna(), portfolio_weights.dropna()
+
+
+def _apply_weights(stock_returns: pd.DataFrame, rebalance_dates: List[pd.Timestamp],
+                   all_weights: List[pd.Series]) -> pd.Series:
+    """
+    Portfolio return of every date, in one pass after all rebalances are known.
+
+    Each date is earned with the weights of the latest rebalance on or before it, for at most HOLDING_PERIOD rows
+    from that rebalance; later dates stay NaN until the next rebalance. Missing stock returns contribute nothing.
+    """
+    if not rebalance_dates:
+        return pd.Series(np.nan, index=stock_returns.index)
+
+    # (K, N) weights of each rebalance over every stock column
+    W = np.vstack([weights.reindex(stock_returns.columns).fillna(0).to_numpy(dtype=np.float64)
+                   for weights in all_weights])
+    R = stock_returns.to_numpy()
+    R = np.where(np.isnan(R), 0, R)
+
+    # First row each rebalance's weights apply to, and for each row the latest rebalance starting on or before it
+    starts = stock_returns.index.searchsorted(rebalance_dates)
+    rows = np.arange(len(R))
+    latest = np.searchsorted(starts, rows, side='right') - 1
+    held = (latest >= 0) & (rows - starts[np.maximum(latest, 0)] < HOLDING_PERIOD)
+
+    returns = np.einsum('ij,ij->i', R, W[np.maximum(latest, 0)])
+    return pd.Series(np.where(held, returns, np.nan), index=stock_returns.index)
+
+
+def _fit_windows_rolling(stock_prices: PriceMatrix, stock_returns: np.ndarray, model: FactorModel,
+                         windows: List[Tuple[pd.Timestamp, slice]]) -> List[pd.Series]:
+    """Fit the windows in order, rolling the model's market-beta sums forward from one window to the next."""
+    market_returns = model.market_returns(stock_returns)
+    # Rows of the previous window
+    window_rows = slice(0, 0)
+    model.reset_window()
+
+    all_weights = []
+    for end_date, rows in windows:
+        logger.info(f"Processing end date: {end_date}")
+        window_data = stock_prices.take(rows)
+        window_returns = stock_returns[rows]
+        logger.info(f"Window data size: {len(window_data.tickers)}")
+
+        if rows.start >= window_rows.stop:
+            # No overlap with the previous window
+            model.reset_window()
+            betas = model.update_window(window_returns, new_market=market_returns[rows])
+        else:
+            entering = slice(window_rows.stop, rows.stop)
+            leaving = slice(window_rows.start, rows.start)
+            betas = model.update_window(stock_returns[entering], stock_returns[leaving],
+                                        market_returns[entering], market_returns[leaving])
+        window_rows = rows
+
+        model.fit_window(window_data, window_returns, betas)
+        all_weights.append(model.construct_portfolio(window_data, TARGET_EXPOSURES))
+    return all_weights
+
+
+def _fit_windows_parallel(stock_prices: PriceMatrix, stock_returns: np.ndarray, model: FactorModel,
+                          windows: List[Tuple[pd.Timestamp, slice]], n_jobs: int) -> List[pd.Series]:
+    """Fit every window independently in a pool of `n_jobs` processes, each holding one copy of the sample."""
+    logger.info(f"Fitting {len(windows)} windows in {n_jobs} processes...")
+    model_args = (model.factors, model.benchmark_ticker, model.dtype == np.float32)
+    # spawn rather than fork: forking a process whose numba/BLAS thread pools are running is unsafe
+    with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(stock_prices, stock_returns, model_args)) as pool:
+        return list(pool.map(_fit_window_weights, [rows for _, rows in windows]))
+
+
+def _init_worker(stock_prices: PriceMatrix, stock_returns: np.ndarray, model_args: tuple) -> None:
+    global _worker
+    factors, benchmark_ticker, fp32 = model_args
+    # The market return of a row does not depend on the window, so each worker computes it once for the whole sample
+    _worker = (stock_prices, stock_returns, FactorModel.market_returns(stock_returns),
+               FactorModel(factors, benchmark_ticker=benchmark_ticker, fp32=fp32))
+
+
+def _fit_window_weights(rows: slice) -> pd.Series:
+    stock_prices, stock_returns, market_returns, model = _worker
+    window_data = stock_prices.take(rows)
+    model.fit_window(window_data, stock_returns[rows], market=market_returns[rows])
+    return model.construct_portfolio(window_data, TARGET_EXPOSURES)
@@ -1,38 +1,112 @@
+import numpy as np
 import pandas as pd
-from src.data.data_fetcher import DataFetcher
-from typing import Dict, Tuple, List
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Tuple, List, Optional, Union
 from pathlib import Path
 
 
-def prepare_returns_data(historical_data: Dict[str, pd.DataFrame]) -> pd.DataFrame:
-    close_prices = {ticker: data['close'] for ticker, data in historical_data.items()}
-    price_df = pd.DataFrame(close_prices)
-    return price_df.pct_change(fill_method=None)
+@dataclass
+class PriceMatrix:
+    """
+    Prices for many tickers stored as aligned (T, N) arrays rather than one DataFrame per ticker.
 
+    Attributes:
+        close (np.ndarray): Close prices, one row per date and one column per ticker (NaN where a ticker has no bar).
+        index (pd.DatetimeIndex): Dates of the rows.
+        tickers (List[str]): Tickers of the columns.
+        volume (Optional[np.ndarray]): Volumes in the same layout, if every input frame has a 'volume' column.
+    """
+    close: np.ndarray
+    index: pd.DatetimeIndex
+    tickers: List[str]
+    volume: Optional[np.ndarray] = None
 
-def fetch_benchmark_returns(start_date: str, end_date: str, benchmark: str) -> pd.Series:
-    """Fetch benchmark returns for the given period."""
-    # Fetch historical data using DataFetcher
-    data_fetcher = DataFetcher(mode='persistent')
-    benchmark_data = data_fetcher.fetch_historical_data(
-        tickers=[benchmark],
-        start_date=start_date,
-        end_date=end_date
-    )
+    @classmethod
+    def from_frames(cls, historical_data: Dict[str, pd.DataFrame], dtype=np.float32) -> 'PriceMatrix':
+        """Align per-ticker frames on the union of their dates and stack them column-wise."""
+        close = _stack_column(historical_data, 'close')
+        volume = None
+        if historical_data and all('volume' in data.columns for data in historical_data.values()):
+            volume = _stack_column(historical_data, 'volume').reindex(close.index).to_numpy(dtype)
+        return cls(close.to_numpy(dtype), close.index, list(close.columns), volume)
 
-    if not benchmark_data or benchmark not in benchmark_data:
-        print(f'No data available for benchmark {benchmark}. Exiting...')
-        exit(1)
+    def to_frame(self) -> pd.DataFrame:
+        """Close prices as a DataFrame indexed by date with one column per ticker."""
+        return pd.DataFrame(self.close, index=self.index, columns=self.tickers)
 
-    # Extract the 'close' prices for the benchmark and calculate returns
-    benchmark_prices = benchmark_data[benchmark]['close']
-    return benchmark_prices.pct_change().dropna()
+    def drop(self, ticker: str) -> 'PriceMatrix':
+        """Return a matrix without `ticker`'s column (or this matrix if it has no such column)."""
+        if ticker not in self.tickers:
+            return self
+        keep = [i for i, t in enumerate(self.tickers) if t != ticker]
+        volume = None if self.volume is None else self.volume[:, keep]
+        return PriceMatrix(self.close[:, keep], self.index, [self.tickers[i] for i in keep], volume)
+
+    def returns(self) -> np.ndarray:
+        """Simple close-to-close returns in the layout of `close`; the first row is NaN."""
+        return _simple_returns(self.close)
+
+    def take(self, rows: slice) -> 'PriceMatrix':
+        """Return the rows selected by a positional slice."""
+        volume = None if self.volume is None else self.volume[rows]
+        return PriceMatrix(self.close[rows], self.index[rows], self.tickers, volume)
+
+
+def _simple_returns(prices: np.ndarray) -> np.ndarray:
+    """Row-over-row simple returns of a (T, N) price array as one ufunc pass, with a NaN first row."""
+    prices = np.asarray(prices, dtype=np.result_type(prices.dtype, np.float32))
+    returns = np.empty_like(prices)
+    if len(prices) > 0:
+        returns[0] = np.nan
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(prices[1:], prices[:-1], out=returns[1:])
+        returns[1:] -= 1
+    return returns
+
+
+def _stack_column(historical_data: Dict[str, pd.DataFrame], column: str) -> pd.DataFrame:
+    """Outer-join one column of every ticker's frame into a (dates x tickers) DataFrame."""
+    if not historical_data:
+        return pd.DataFrame()
+    frames = list(historical_data.values())
+    index = frames[0].index
+    if all(data.index.equals(index) for data in frames[1:]):
+        # Already aligned (e.g. every ticker traded on every date): stack the columns without any index alignment
+        values = np.column_stack([data[column].to_numpy() for data in frames])
+        return pd.DataFrame(values, index=index, columns=list(historical_data))
+    # A single concat aligns all columns at once; the dict constructor realigns each column to the union index
+    return pd.concat([data[column].rename(ticker) for ticker, data in historical_data.items()], axis=1, sort=True)
+
+
+def prepare_returns_data(historical_data: Union[Dict[str, pd.DataFrame], PriceMatrix]) -> pd.DataFrame:
+    """Simple returns of every ticker, from the second date on (the first date has no previous close)."""
+    if isinstance(historical_data, PriceMatrix):
+        prices, index, tickers = historical_data.close, historical_data.index, historical_data.tickers
+    else:
+        price_df = _stack_column(historical_data, 'close')
+        prices, index, tickers = price_df.to_numpy(), price_df.index, price_df.columns
+    return pd.DataFrame(_simple_returns(prices)[1:], index=index[1:], columns=tickers)
+
+
+def calculate_benchmark_returns(benchmark_data: pd.DataFrame) -> pd.Series:
+    """Calculate benchmark returns from its price frame (fetched in the same batch as the stocks)."""
+    return benchmark_data['close'].pct_change().dropna()
 
 
 def load_snp_constituents() -> Tuple[pd.Series, List[str]]:
+    weights, tickers = _read_snp_constituents()
+    # Copies, so callers cannot alter the cached result
+    return weights.copy(), list(tickers)
+
+
+@lru_cache(maxsize=1)
+def _read_snp_constituents() -> Tuple[pd.Series, Tuple[str, ...]]:
+    """Parse the constituents file once per process; it does not change while the program runs."""
     file_path = Path(__file__).parent.parent / "data" / "constituents" / "snp_constituents.csv"
     constituents_df = pd.read_csv(file_path)
-    constituents_df['weight'] = constituents_df['weight'].str.rstrip('%').astype('float') / 100.0
+    # Index weights need nowhere near float64 precision
+    constituents_df['weight'] = constituents_df['weight'].str.rstrip('%').astype(np.float32) / 100
     weights = constituents_df.set_index('ticker')['weight']
-    tickers = constituents_df['ticker'].tolist()
+    tickers = tuple(constituents_df['ticker'])
     return weights, tickers
@@ -1,96 +1,183 @@
 import numpy as np
 import pandas as pd
-from typing import Tuple, Dict
+from functools import cached_property
+from typing import Tuple, Dict, NamedTuple
 from loguru import logger
+from src.utils._njit import njit, prange, NUMBA_AVAILABLE
+
+try:
+    import bottleneck as bn
+except ImportError:  # bottleneck is an optional extra; NumPy's reductions are used without it
+    bn = None
+
+
+class _Moments(NamedTuple):
+    """Counts, means and squared-deviation sums behind the ratio metrics, each over its own non-NaN entries."""
+    n_excess: float
+    mean_excess: float
+    m2_excess: float
+    n_benchmark: float
+    mean_benchmark: float
+    m2_benchmark: float
+    n_active: float
+    mean_active: float
+    m2_active: float
+    n_cross: float
+    cross_mean_excess: float
+    cross_mean_benchmark: float
+    comoment: float
+    n_downside: float
+    sumsq_downside: float
+
+
+_NUM_MOMENTS = len(_Moments._fields)
+_SQRT_252 = np.sqrt(252)  # annualises daily ratios
+
+
+# Ratio algebra over the moments. The fields may be scalars for one portfolio or arrays for a batch.
+
+def _annualize(total_return: float, num_years: float) -> float:
+    return (1 + total_return) ** (1 / num_years) - 1
+
+
+def _sharpe(m: _Moments) -> float:
+    return _SQRT_252 * m.mean_excess / np.sqrt(m.m2_excess / (m.n_excess - 1))
+
+
+def _information(m: _Moments) -> float:
+    return _SQRT_252 * m.mean_active / np.sqrt(m.m2_active / (m.n_active - 1))
+
+
+def _tracking_error(m: _Moments) -> float:
+    return _SQRT_252 * np.sqrt(m.m2_active / (m.n_active - 1))
+
+
+def _sortino(m: _Moments) -> float:
+    downside_deviation = np.sqrt(m.sumsq_downside / m.n_downside)
+    return _SQRT_252 * m.mean_excess / downside_deviation
+
+
+def _regression(m: _Moments) -> Tuple[float, float]:
+    # Calculate covariance manually to avoid issues with np.cov() edge case
+    benchmark_var = m.m2_benchmark / m.n_benchmark
+    # E[xy] - E[x]E[y], with E[xy] over the dates both are known, recovered from the centred co-moment so small
+    # excess returns do not cancel; the mean corrections vanish when neither series has gaps
+    covariance = (m.comoment / m.n_cross + m.cross_mean_excess * m.cross_mean_benchmark
+                  - m.mean_excess * m.mean_benchmark)
+
+    beta = covariance / benchmark_var
+    alpha = m.mean_excess - (beta * m.mean_benchmark)
+    return alpha * 252, beta  # Annualize alpha
 
 
 class PortfolioPerformance:
-    def __init__(self, portfolio_returns: pd.Series, benchmark_returns: pd.Series, risk_free_rate: float = 0.02):
+    def __init__(self, portfolio_returns: pd.Series, benchmark_returns: pd.Series, risk_free_rate: float = 0.02,
+                 fp32: bool = False):
         self.portfolio_returns = portfolio_returns
         self.benchmark_returns = benchmark_returns
         self.risk_free_rate = risk_free_rate
         self.daily_risk_free_rate = (1 + risk_free_rate) ** (1 / 252) - 1
+        # Opt-in for bulk backtests: the ratio moments read float32 returns, halving their memory traffic. Total
+        # return and drawdown compound over the whole series and always stay in float64.
+        self.dtype = np.float32 if fp32 else np.float64
+
+        # Align the returns; callers usually pass series on the same index, which needs no reindexing
+        if not self.portfolio_returns.index.equals(self.benchmark_returns.index):
+            self.portfolio_returns, self.benchmark_returns = self.portfolio_returns.align(self.benchmark_returns,
+                                                                                          join='inner')
 
-        # Align the returns
-        self.portfolio_returns, self.benchmark_returns = self.portfolio_returns.align(self.benchmark_returns,
-                                                                                      join='inner')
+        logger.opt(lazy=True).debug("Portfolio returns shape: {}", lambda: self.portfolio_returns.shape)
+        logger.opt(lazy=True).debug("Benchmark returns shape: {}", lambda: self.benchmark_returns.shape)
 
-        logger.info(f"Portfolio returns shape: {self.portfolio_returns.shape}")
-        logger.info(f"Benchmark returns shape: {self.benchmark_returns.shape}")
+        # Every metric reduces these arrays rather than the Series. NaNs are skipped, as pandas reductions do.
+        self._pr = self.portfolio_returns.to_numpy(dtype=np.float64)
+        self._br = self.benchmark_returns.to_numpy(dtype=np.float64)
+        self._num_years = len(self._pr) / 252
 
     def total_return(self) -> float:
         """Calculate the total return of the portfolio."""
-        return (self.portfolio_returns + 1).prod() - 1
+        return self._total_return
 
     def annualized_return(self) -> float:
         """Calculate the annualized return of the portfolio."""
-        total_return = self.total_return()
-        num_years = len(self.portfolio_returns) / 252
-        return (1 + total_return) ** (1 / num_years) - 1
+        return _annualize(self._total_return, self._num_years)
 
     def sharpe_ratio(self) -> float:
         """Calculate the Sharpe ratio of the portfolio."""
-        excess_returns = self.portfolio_returns - self.daily_risk_free_rate
-        return np.sqrt(252) * excess_returns.mean() / excess_returns.std()
+        return _sharpe(self._moments)
 
     def max_drawdown(self) -> float:
         """Calculate the maximum drawdown of the portfolio."""
-        cumulative_returns = (1 + self.portfolio_returns).cumprod()
-        peak = cumulative_returns.expanding(min_periods=1).max()
-        drawdown = (cumulative_returns / peak) - 1
-        return drawdown.min()
+        return self._max_drawdown
 
     def alpha_beta(self) -> Tuple[float, float]:
-        excess_portfolio_returns = self.portfolio_returns - self.daily_risk_free_rate
-        excess_benchmark_returns = self.benchmark_returns - self.daily_risk_free_rate
-
-        logger.info(f"Excess portfolio returns shape: {excess_portfolio_returns.shape}")
-        logger.info(f"Excess benchmark returns shape: {excess_benchmark_returns.shape}")
-
-        if len(excess_portfolio_returns) != len(excess_benchmark_returns):
-            raise ValueError("Portfolio and benchmark returns have different lengths")
-
-        # Calculate covariance manually to avoid issues with np.cov() edge case
-        portfolio_var = np.var(excess_portfolio_returns)
-        benchmark_var = np.var(excess_benchmark_returns)
-        covariance = np.mean(excess_portfolio_returns * excess_benchmark_returns) - (
-                    np.mean(excess_portfolio_returns) * np.mean(excess_benchmark_returns))
-
-        beta = covariance / benchmark_var
-        alpha = np.mean(excess_portfolio_returns) - (beta * np.mean(excess_benchmark_returns))
-
-        return float(alpha * 252), float(beta)  # Annualize alpha and convert to float
+        return self._alpha_beta
 
     def information_ratio(self) -> float:
         """Calculate the information ratio of the portfolio."""
-        active_returns = self.portfolio_returns - self.benchmark_returns
-        return np.sqrt(252) * active_returns.mean() / active_returns.std()
+        return _information(self._moments)
 
     def tracking_error(self) -> float:
         """Calculate the tracking error of the portfolio relative to the benchmark."""
-        return np.sqrt(252) * (self.portfolio_returns - self.benchmark_returns).std()
+        return _tracking_error(self._moments)
 
     def sortino_ratio(self) -> float:
         """Calculate the Sortino ratio of the portfolio."""
-        excess_returns = self.portfolio_returns - self.daily_risk_free_rate
-        downside_returns = excess_returns[excess_returns < 0]
-        downside_deviation = np.sqrt(np.mean(downside_returns ** 2))
-        return np.sqrt(252) * excess_returns.mean() / downside_deviation
+        return _sortino(self._moments)
 
     def calmar_ratio(self) -> float:
         """Calculate the Calmar ratio of the portfolio."""
-        return self.annualized_return() / abs(self.max_drawdown())
+        return self.annualized_return() / abs(self._max_drawdown)
 
     def summary(self) -> Dict[str, float]:
+        return dict(self._summary)
+
+    @cached_property
+    def cumulative_returns(self) -> pd.Series:
+        """Growth of one unit invested in the portfolio, computed once and shared with the plots."""
+        return pd.Series(self._wealth, index=self.portfolio_returns.index)
+
+    @cached_property
+    def _wealth(self) -> np.ndarray:
+        return cumulative_wealth(self._pr)
+
+    @cached_property
+    def _total_return(self) -> np.float64:
+        return _total_return_numpy(self._pr)
+
+    @cached_property
+    def _max_drawdown(self) -> float:
+        if NUMBA_AVAILABLE:
+            return np.float64(_max_drawdown_kernel(self._pr))
+        return np.float64(_max_drawdown_numpy(self._wealth))
+
+    @cached_property
+    def _moments(self) -> _Moments:
+        if len(self._pr) != len(self._br):
+            raise ValueError("Portfolio and benchmark returns have different lengths")
+        moments = _moments_kernel if NUMBA_AVAILABLE else _moments_numpy
+        # NumPy scalars keep the ratio algebra returning inf/NaN on degenerate input instead of raising
+        portfolio, benchmark = self._pr.astype(self.dtype, copy=False), self._br.astype(self.dtype, copy=False)
+        return _Moments(*map(np.float64, moments(portfolio, benchmark, self.daily_risk_free_rate)))
+
+    @cached_property
+    def _alpha_beta(self) -> Tuple[float, float]:
+        alpha, beta = _regression(self._moments)
+        return float(alpha), float(beta)
+
+    @cached_property
+    def _summary(self) -> Dict[str, float]:
+        # Each metric, and each subexpression shared between metrics, is computed once per instance
         result = {}
         try:
+            alpha, beta = self._alpha_beta
             for key, value in {
                 "Total Return": self.total_return(),
                 "Annualized Return": self.annualized_return(),
                 "Sharpe Ratio": self.sharpe_ratio(),
                 "Max Drawdown": self.max_drawdown(),
-                "Alpha": self.alpha_beta()[0],
-                "Beta": self.alpha_beta()[1],
+                "Alpha": alpha,
+                "Beta": beta,
                 "Information Ratio": self.information_ratio(),
                 "Tracking Error": self.tracking_error(),
                 "Sortino Ratio": self.sortino_ratio(),
@@ -104,6 +191,210 @@ class PortfolioPerformance:
         return result
 
 
+def _moments_numpy(portfolio: np.ndarray, benchmark: np.ndarray, risk_free_rate: float) -> _Moments:
+    """
+    Reduce the portfolio and benchmark returns to every moment the ratio metrics need.
+
+    Args:
+        portfolio (np.ndarray): Portfolio returns
+        benchmark (np.ndarray): Benchmark returns aligned with the portfolio
+        risk_free_rate (float): Periodic risk-free rate subtracted to form excess returns
+
+    Returns:
+        _Moments: Moments of the excess, benchmark-excess and active returns
+    """
+    # Rows are excess, benchmark excess and active returns; NaNs are left out of every count and sum
+    series = np.stack([portfolio - risk_free_rate, benchmark - risk_free_rate, portfolio - benchmark])
+    valid = ~np.isnan(series)
+    counts = valid.sum(axis=1).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if bn is not None:
+            # One NaN-skipping C loop per row, without the zeroed and centred copies
+            means = bn.nanmean(series, axis=1)
+            m2 = bn.nanvar(series, axis=1) * counts
+        else:
+            zeroed = np.where(valid, series, 0.0)
+            means = zeroed.sum(axis=1) / counts
+            deviations = np.where(valid, series - means[:, None], 0.0)
+            m2 = np.where(counts > 0, np.einsum('ij,ij->i', deviations, deviations), np.nan)
+
+    excess = series[0]
+    cross = valid[0] & valid[1]
+    n_cross = np.count_nonzero(cross)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cross_means = series[:2, cross].sum(axis=1) / n_cross
+    cross_deviations = series[:2, cross] - cross_means[:, None]
+    downside = np.fmin(excess, 0.0)  # fmin maps NaN to 0, so missing periods add nothing
+    return _Moments(counts[0], means[0], m2[0], counts[1], means[1], m2[1], counts[2], means[2], m2[2],
+                    np.float64(n_cross), cross_means[0], cross_means[1], cross_deviations[0] @ cross_deviations[1],
+                    np.float64(np.count_nonzero(excess < 0)), downside @ downside)
+
+
+@njit(cache=True)
+def _moments_kernel(portfolio: np.ndarray, benchmark: np.ndarray, risk_free_rate: float) -> Tuple[float, ...]:
+    """
+    Single-loop equivalent of `_moments_numpy`.
+
+    Means and squared-deviation sums are updated with Welford's recurrence, which avoids the cancellation of raw
+    sums of squares on small daily returns. NaNs are skipped, so fastmath stays off (see `_njit`).
+
+    Args:
+        portfolio (np.ndarray): Portfolio returns
+        benchmark (np.ndarray): Benchmark returns aligned with the portfolio
+        risk_free_rate (float): Periodic risk-free rate subtracted to form excess returns
+
+    Returns:
+        Tuple[float, ...]: The fields of `_Moments`, in order
+    """
+    counts = np.zeros(3)
+    means = np.zeros(3)
+    m2 = np.zeros(3)
+    values = np.empty(3)
+    n_cross = 0.0
+    cross_mean_excess = 0.0
+    cross_mean_benchmark = 0.0
+    comoment = 0.0
+    n_downside = 0.0
+    sumsq_downside = 0.0
+    for t in range(portfolio.shape[0]):
+        excess = portfolio[t] - risk_free_rate
+        benchmark_excess = benchmark[t] - risk_free_rate
+        values[0] = excess
+        values[1] = benchmark_excess
+        values[2] = portfolio[t] - benchmark[t]
+        for k in range(3):
+            x = values[k]
+            if not np.isnan(x):
+                counts[k] += 1.0
+                delta = x - means[k]
+                means[k] += delta / counts[k]
+                m2[k] += delta * (x - means[k])
+        if not np.isnan(excess):
+            if not np.isnan(benchmark_excess):
+                n_cross += 1.0
+                delta = excess - cross_mean_excess
+                cross_mean_excess += delta / n_cross
+                cross_mean_benchmark += (benchmark_excess - cross_mean_benchmark) / n_cross
+                comoment += delta * (benchmark_excess - cross_mean_benchmark)
+            if excess < 0:
+                n_downside += 1.0
+                sumsq_downside += excess * excess
+
+    # Empty series have no mean or spread, matching np.nanmean and np.nanstd
+    for k in range(3):
+        if counts[k] == 0:
+            means[k] = np.nan
+            m2[k] = np.nan
+    if n_cross == 0:
+        cross_mean_excess = np.nan
+        cross_mean_benchmark = np.nan
+    return (counts[0], means[0], m2[0], counts[1], means[1], m2[1], counts[2], means[2], m2[2],
+            n_cross, cross_mean_excess, cross_mean_benchmark, comoment, n_downside, sumsq_downside)
+
+
+def _total_return_numpy(returns: np.ndarray) -> np.ndarray:
+    """
+    Compounded return along the last axis, skipping NaN periods as pandas' prod does.
+
+    Summing log growth is one fused pass and does not drift the way a long running product does. log1p is undefined
+    at or below -100% (possible for a long/short portfolio), so series with such a period fall back to the product.
+    """
+    returns = np.where(np.isnan(returns), 0.0, returns)
+    wiped_out = returns <= -1
+    total = np.expm1(np.sum(np.log1p(np.where(wiped_out, 0.0, returns)), axis=-1))
+    if wiped_out.any():
+        total = np.where(wiped_out.any(axis=-1), np.prod(1.0 + returns, axis=-1) - 1.0, total)[()]
+    return total
+
+
+@njit(cache=True)
+def _total_return_kernel(returns: np.ndarray) -> float:
+    """Single-loop equivalent of `_total_return_numpy` for one series, with the same NaN and -100% rules."""
+    log_growth = 0.0
+    wiped_out = False
+    for t in range(returns.shape[0]):
+        r = returns[t]
+        if r <= -1.0:
+            wiped_out = True
+        elif not np.isnan(r):
+            log_growth += np.log1p(r)
+    if not wiped_out:
+        return np.expm1(log_growth)
+    growth = 1.0
+    for t in range(returns.shape[0]):
+        if not np.isnan(returns[t]):
+            growth *= 1.0 + returns[t]
+    return growth - 1.0
+
+
+def _max_drawdown_numpy(wealth: np.ndarray) -> float:
+    """Largest peak-to-trough decline of a cumulative wealth path, NaN when no period is valid."""
+    drawdowns = drawdown(wealth)
+    drawdowns = drawdowns[~np.isnan(drawdowns)]
+    return drawdowns.min() if drawdowns.size else np.nan
+
+
+@njit(cache=True, error_model='numpy')
+def _max_drawdown_kernel(returns: np.ndarray) -> float:
+    """
+    Single-loop equivalent of `_max_drawdown_numpy` that works from the returns and never materialises the wealth or
+    drawdown paths.
+
+    The loop body has no data-dependent branches: NaN returns are neutralised by selects, which compile to
+    conditional moves, and the NumPy error model lets a zero peak yield NaN instead of raising. fastmath stays off
+    (see `_njit`).
+
+    Args:
+        returns (np.ndarray): Periodic returns; NaNs are skipped
+
+    Returns:
+        float: The most negative drawdown, NaN when no return is valid
+    """
+    wealth = 1.0
+    peak = -np.inf  # the first valid period sets the peak, as the expanding maximum does
+    worst = np.inf
+    for t in range(returns.shape[0]):
+        r = returns[t]
+        valid = r == r
+        wealth *= 1.0 + (r if valid else 0.0)
+        peak = wealth if valid and wealth > peak else peak
+        dd = wealth / peak - 1.0
+        worst = dd if valid and dd < worst else worst
+    return worst if worst < np.inf else np.nan
+
+
+def cumulative_wealth(returns: np.ndarray) -> np.ndarray:
+    """
+    Calculate the growth of one unit invested, period by period.
+
+    Args:
+        returns (np.ndarray): Periodic returns; NaNs are skipped like pandas' cumprod and stay NaN in the output
+
+    Returns:
+        np.ndarray: Cumulative wealth at each period
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    missing = np.isnan(returns)
+    wealth = np.cumprod(1.0 + np.where(missing, 0.0, returns))
+    wealth[missing] = np.nan
+    return wealth
+
+
+def drawdown(wealth: np.ndarray) -> np.ndarray:
+    """
+    Calculate the drawdown from the running peak of cumulative wealth.
+
+    Args:
+        wealth (np.ndarray): Cumulative wealth, as returned by `cumulative_wealth`; NaN periods stay NaN
+
+    Returns:
+        np.ndarray: Drawdown at each period, zero at a new peak and negative below it
+    """
+    wealth = np.asarray(wealth, dtype=np.float64)
+    # fmax ignores NaN, so missing periods neither set nor reset the running peak
+    return wealth / np.fmax.accumulate(wealth) - 1.0
+
+
 def calculate_turnover(portfolio_weights: pd.DataFrame) -> float:
     """
     Calculate the average turnover of the portfolio.
@@ -114,8 +405,32 @@ def calculate_turnover(portfolio_weights: pd.DataFrame) -> float:
     Returns:
         float: Average turnover
     """
-    weight_changes = portfolio_weights.diff().abs().sum(axis=1)
-    return weight_changes.mean() / 2  # Divide by 2 to avoid double counting
+    weights = portfolio_weights.to_numpy(dtype=np.float64)
+    if len(weights) == 0:
+        return np.nan
+    # The first period has no change but still counts towards the mean, as it did with diff().sum(axis=1).mean()
+    turnover = _turnover_kernel if NUMBA_AVAILABLE else _turnover_numpy
+    return np.float64(turnover(weights)) / len(weights) / 2  # Divide by 2 to avoid double counting
+
+
+def _turnover_numpy(weights: np.ndarray) -> float:
+    """Total absolute weight change of a (T, N) weight array, skipping NaN weights."""
+    changes = np.empty((weights.shape[0] - 1, weights.shape[1]))
+    np.subtract(weights[1:], weights[:-1], out=changes)
+    np.abs(changes, out=changes)
+    return np.nansum(changes)
+
+
+@njit(cache=True)
+def _turnover_kernel(weights: np.ndarray) -> float:
+    """Single-loop equivalent of `_turnover_numpy` that never materialises the weight changes."""
+    total = 0.0
+    for t in range(1, weights.shape[0]):
+        for i in range(weights.shape[1]):
+            change = abs(weights[t, i] - weights[t - 1, i])
+            if not np.isnan(change):
+                total += change
+    return total
 
 
 def perform_factor_attribution(factor_returns: pd.DataFrame, factor_exposures: pd.DataFrame,
@@ -131,12 +446,89 @@ def perform_factor_attribution(factor_returns: pd.DataFrame, factor_exposures: p
     Returns:
         pd.Series: Attribution of returns to each factor
     """
-    factor_contribution = factor_returns.multiply(factor_exposures.mean(), axis=1)
-    total_factor_contribution = factor_contribution.sum()
+    # Summing each factor's returns before scaling by its mean exposure avoids building the T x K contributions
+    mean_exposures = factor_exposures.mean().reindex(factor_returns.columns).to_numpy(dtype=np.float64)
+    factor_totals = np.nansum(factor_returns.to_numpy(dtype=np.float64), axis=0)
+    attribution = np.empty(len(factor_returns.columns) + 1)
+    attribution[:-1] = np.where(np.isnan(mean_exposures), 0.0, factor_totals * mean_exposures)
 
     # Calculate residual return
     total_portfolio_return = portfolio_returns.sum()
-    residual = total_portfolio_return - total_factor_contribution.sum()
+    attribution[-1] = total_portfolio_return - attribution[:-1].sum()
 
-    attribution = total_factor_contribution._append(pd.Series({'Residual': residual}))
+    attribution = pd.Series(attribution, index=factor_returns.columns.append(pd.Index(['Residual'])))
     return attribution / total_portfolio_return  # Return as a percentage of total return
+
+
+def compute_metrics_batch(portfolio_returns: pd.DataFrame, benchmark_returns: pd.Series,
+                          risk_free_rate: float = 0.02) -> pd.DataFrame:
+    """
+    Calculate the summary metrics of many portfolios at once, e.g. bootstrap or Monte Carlo return paths.
+
+    With numba installed the portfolios are reduced in parallel, one task per portfolio.
+
+    Args:
+        portfolio_returns (pd.DataFrame): Returns over time, one column per portfolio
+        benchmark_returns (pd.Series): Benchmark returns shared by every portfolio
+        risk_free_rate (float): Annual risk-free rate
+
+    Returns:
+        pd.DataFrame: One row per portfolio, with the columns of `PortfolioPerformance.summary`
+    """
+    if not portfolio_returns.index.equals(benchmark_returns.index):
+        portfolio_returns, benchmark_returns = portfolio_returns.align(benchmark_returns, join='inner', axis=0)
+    daily_risk_free_rate = (1 + risk_free_rate) ** (1 / 252) - 1
+    # Portfolio-major copy so each parallel task reduces one contiguous row
+    returns_t = np.ascontiguousarray(portfolio_returns.to_numpy(dtype=np.float64).T)
+    benchmark = benchmark_returns.to_numpy(dtype=np.float64)
+
+    if NUMBA_AVAILABLE:
+        moments, total_returns, max_drawdowns = _metrics_batch_kernel(returns_t, benchmark, daily_risk_free_rate)
+    else:
+        moments = np.array([_moments_numpy(r, benchmark, daily_risk_free_rate) for r in returns_t])
+        moments = moments.reshape(len(returns_t), _NUM_MOMENTS)
+        total_returns = _total_return_numpy(returns_t)
+        max_drawdowns = np.array([_max_drawdown_numpy(cumulative_wealth(r)) for r in returns_t])
+
+    m = _Moments(*moments.T)
+    alpha, beta = _regression(m)
+    annualized_returns = _annualize(total_returns, returns_t.shape[1] / 252)
+    return pd.DataFrame({
+        "Total Return": total_returns,
+        "Annualized Return": annualized_returns,
+        "Sharpe Ratio": _sharpe(m),
+        "Max Drawdown": max_drawdowns,
+        "Alpha": alpha,
+        "Beta": beta,
+        "Information Ratio": _information(m),
+        "Tracking Error": _tracking_error(m),
+        "Sortino Ratio": _sortino(m),
+        "Calmar Ratio": annualized_returns / np.abs(max_drawdowns)
+    }, index=portfolio_returns.columns)
+
+
+@njit(parallel=True, cache=True)
+def _metrics_batch_kernel(returns_t: np.ndarray, benchmark: np.ndarray,
+                          risk_free_rate: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Moments, total return and max drawdown of every portfolio, one parallel task per portfolio.
+
+    Args:
+        returns_t (np.ndarray): (P, T) returns, one contiguous row per portfolio.
+        benchmark (np.ndarray): (T,) benchmark returns.
+        risk_free_rate (float): Periodic risk-free rate.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (P, len(_Moments)) moments, (P,) total returns and (P,) max
+            drawdowns.
+    """
+    num_portfolios = returns_t.shape[0]
+    moments = np.empty((num_portfolios, _NUM_MOMENTS))
+    total_returns = np.empty(num_portfolios)
+    max_drawdowns = np.empty(num_portfolios)
+    for p in prange(num_portfolios):
+        r = returns_t[p]
+        moments[p] = np.array(_moments_kernel(r, benchmark, risk_free_rate))
+        total_returns[p] = _total_return_kernel(r)
+        max_drawdowns[p] = _max_drawdown_kernel(r)
+    return moments, total_returns, max_drawdowns
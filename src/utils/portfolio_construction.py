@@ -1,18 +1,54 @@
 import pandas as pd
 import numpy as np
-from typing import Dict
-from src.utils.data_preparation import load_snp_constituents, prepare_returns_data
+from functools import lru_cache
+from typing import Dict, Tuple, Union
+from src.utils.data_preparation import load_snp_constituents, prepare_returns_data, PriceMatrix
+from src.utils._njit import njit, NUMBA_AVAILABLE
 
 
 def construct_equal_weight_portfolio(returns_data: pd.DataFrame) -> pd.Series:
     """Construct an equal-weighted portfolio."""
-    weights = np.ones(len(returns_data.columns)) / len(returns_data.columns)
-    return (returns_data * weights).sum(axis=1)
+    num_stocks = len(returns_data.columns)
+    # A plain row sum scaled by 1/N: a missing return counts as zero instead of renormalising the row, as mean would
+    total = np.nansum(returns_data.to_numpy(dtype=np.float64), axis=1)
+    return pd.Series(total / num_stocks if num_stocks else total, index=returns_data.index)
 
 
-def construct_market_cap_weight_portfolio(historical_data: Dict[str, pd.DataFrame]) -> pd.Series:
+def construct_market_cap_weight_portfolio(historical_data: Union[Dict[str, pd.DataFrame], PriceMatrix]) -> pd.Series:
     """Construct a market-cap weighted portfolio using S&P 500 weights."""
     returns_data = prepare_returns_data(historical_data)
+    aligned_weights = _aligned_snp_weights(tuple(returns_data.columns))
+    return _weighted_returns(returns_data, aligned_weights)
+
+
+def _weighted_returns(returns_data: pd.DataFrame, weights: np.ndarray) -> pd.Series:
+    """Per-period portfolio returns for fixed weights; missing returns contribute nothing, like a skipna sum."""
+    returns = returns_data.to_numpy(dtype=np.float64)
+    if NUMBA_AVAILABLE:
+        portfolio_returns = _weighted_returns_kernel(returns, np.asarray(weights, dtype=np.float64))
+    else:
+        portfolio_returns = np.where(np.isnan(returns), 0.0, returns) @ weights
+    return pd.Series(portfolio_returns, index=returns_data.index)
+
+
+@njit(cache=True)
+def _weighted_returns_kernel(returns: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Row-wise weighted sum of a (T, N) return array that skips NaN returns and zero weights in place."""
+    held = np.flatnonzero(weights)
+    portfolio_returns = np.zeros(returns.shape[0])
+    for t in range(returns.shape[0]):
+        total = 0.0
+        for j in held:
+            r = returns[t, j]
+            if not np.isnan(r):
+                total += r * weights[j]
+        portfolio_returns[t] = total
+    return portfolio_returns
+
+
+@lru_cache(maxsize=8)
+def _aligned_snp_weights(columns: Tuple[str, ...]) -> np.ndarray:
+    """Normalised S&P 500 weights aligned to the given return columns, zero for non-constituents."""
     snp_weights, _ = load_snp_constituents()
 
     # Ensure snp_weights is a Series
@@ -20,7 +56,7 @@ def construct_market_cap_weight_portfolio(historical_data: Dict[str, pd.DataFram
         raise TypeError("Expected snp_weights to be a pandas Series")
 
     # Filter weights for stocks present in our historical data
-    portfolio_weights = snp_weights[snp_weights.index.isin(returns_data.columns)]
+    portfolio_weights = snp_weights[snp_weights.index.isin(columns)]
 
     # Check if we have any valid weights
     if portfolio_weights.empty:
@@ -29,7 +65,7 @@ def construct_market_cap_weight_portfolio(historical_data: Dict[str, pd.DataFram
     # Normalize weights to sum to 1
     portfolio_weights = portfolio_weights / portfolio_weights.sum()
 
-    # Align the weights with the returns data
-    aligned_weights = portfolio_weights.reindex(returns_data.columns, fill_value=0)
-
-    return (returns_data * aligned_weights).sum(axis=1)
+    # Align the weights with the returns data; read-only because every caller with these columns shares it
+    aligned_weights = portfolio_weights.reindex(list(columns), fill_value=0).to_numpy(dtype=np.float64)
+    aligned_weights.setflags(write=False)
+    return aligned_weights
@@ -1,15 +1,26 @@
 import matplotlib.pyplot as plt
 import seaborn as sns
-from typing import Dict
+from typing import Dict, Optional
+import numpy as np
 import pandas as pd
+from src.utils.performance_evaluation import cumulative_wealth, drawdown
 
 
-def plot_cumulative_returns(returns_dict: Dict[str, pd.Series]) -> None:
-    """Plot cumulative returns of multiple portfolios/benchmarks."""
-    cumulative_returns = {name: (1 + returns).cumprod() for name, returns in returns_dict.items()}
+def plot_cumulative_returns(returns_dict: Dict[str, pd.Series],
+                            precomputed: Optional[Dict[str, pd.Series]] = None) -> None:
+    """Plot cumulative returns of multiple portfolios/benchmarks, reusing any precomputed cumulative series by name."""
+    precomputed = precomputed or {}
     plt.figure(figsize=(12, 6))
-    for name, returns in cumulative_returns.items():
-        plt.plot(returns.index, returns.values, label=name)
+    for name, returns in returns_dict.items():
+        # Hand matplotlib plain arrays, each materialised once per series. A precomputed series is plotted against its
+        # own index, which can be shorter than `returns` once PortfolioPerformance has aligned it with the benchmark
+        if name in precomputed:
+            dates = precomputed[name].index.to_numpy()
+            cumulative_returns = precomputed[name].to_numpy(dtype=np.float64)
+        else:
+            dates = returns.index.to_numpy()
+            cumulative_returns = cumulative_wealth(returns.to_numpy(dtype=np.float64))
+        plt.plot(dates, cumulative_returns, label=name)
     plt.title('Cumulative Returns Comparison')
     plt.xlabel('Date')
     plt.ylabel('Cumulative Returns')
@@ -17,18 +28,21 @@ def plot_cumulative_returns(returns_dict: Dict[str, pd.Series]) -> None:
     plt.show()
 
 
-def plot_drawdown(returns: pd.Series) -> None:
-    """Plot drawdown of a given portfolio over time."""
-    returns = returns.astype(float)  # make them all floats
-    cumulative_returns = (1 + returns).cumprod()
-    peak = cumulative_returns.expanding(min_periods=1).max()
-    drawdown = (cumulative_returns / peak) - 1
+def plot_drawdown(returns: pd.Series, cumulative_returns: Optional[pd.Series] = None) -> None:
+    """Plot drawdown of a given portfolio over time, from its cumulative returns when already computed."""
+    if cumulative_returns is None:
+        # Converts non-float returns to floats; float64 returns are used as they are, without a copy
+        dates = returns.index.to_numpy()
+        drawdowns = drawdown(cumulative_wealth(returns.to_numpy(dtype=np.float64)))
+    else:
+        dates = cumulative_returns.index.to_numpy()  # may be shorter than `returns` after the benchmark alignment
+        drawdowns = drawdown(cumulative_returns.to_numpy(dtype=np.float64))
     plt.figure(figsize=(12, 6))
-    plt.plot(drawdown.index, drawdown.values)
+    plt.plot(dates, drawdowns)
     plt.title('Portfolio Drawdown')
     plt.xlabel('Date')
     plt.ylabel('Drawdown')
-    plt.fill_between(drawdown.index, drawdown.values, 0, alpha=0.1)
+    plt.fill_between(dates, drawdowns, 0, alpha=0.1)
     plt.show()
 
 
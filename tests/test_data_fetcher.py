@@ -1,10 +1,12 @@
+import asyncio
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import tempfile
 import shutil
-from src.data.data_fetcher import DataFetcher
+from src.data.data_fetcher import DataFetcher, RateLimiter, Bar, AGGS_DECODER, FETCHED_RANGE_ATTR, _reduce_mem
 
 
 class TestDataFetcher(unittest.TestCase):
@@ -17,16 +19,13 @@ class TestDataFetcher(unittest.TestCase):
         # necessary arguments, `ignore_errors=True` added to ensure the cleanup process contineus even if it
         # encounters any issues (e.g. permissions)
 
-    @patch('src.data.data_fetcher.RESTClient')
-    def test_fetch_historical_data_on_demand(self, mock_rest_client):
+    @patch.object(DataFetcher, '_get_aggs', new_callable=AsyncMock)
+    def test_fetch_historical_data_on_demand(self, mock_get_aggs):
         # Mock the Polygon API response
-        mock_aggs = [
-            MagicMock(timestamp=1609459200000, open=100, high=101, low=99, close=100.5, volume=1000000, vwap=100.2,
-                      transactions=5000),
-            MagicMock(timestamp=1609545600000, open=100.5, high=102, low=100, close=101.5, volume=1100000, vwap=101.0,
-                      transactions=5500)
+        mock_get_aggs.return_value = [
+            Bar(t=1609459200000, o=100, h=101, l=99, c=100.5, v=1000000, vw=100.2, n=5000),
+            Bar(t=1609545600000, o=100.5, h=102, l=100, c=101.5, v=1100000, vw=101.0, n=5500)
         ]
-        mock_rest_client.return_value.get_aggs.return_value = mock_aggs
 
         fetcher = DataFetcher(mode='on_demand')
         fetcher.data_dir = Path(self.test_data_dir)
@@ -44,9 +43,9 @@ class TestDataFetcher(unittest.TestCase):
         self.assertListEqual(list(data['AAPL'].columns),
                              ['open', 'high', 'low', 'close', 'volume', 'vwap', 'transactions'])
 
-    @patch('src.data.data_fetcher.RESTClient')
-    def test_fetch_historical_data_persistent(self, mock_rest_client):
-        # Create some test CSV files
+    @patch.object(DataFetcher, '_get_aggs', new_callable=AsyncMock, return_value=[])
+    def test_fetch_historical_data_persistent(self, mock_get_aggs):
+        # Create some test Parquet files
         aapl_df = pd.DataFrame({
             'timestamp': ['2021-01-01', '2021-01-02'],
             'open': [100, 101],
@@ -57,7 +56,8 @@ class TestDataFetcher(unittest.TestCase):
             'vwap': [100.5, 101.5],
             'transactions': [5000, 5500]
         })
-        aapl_df.to_csv(Path(self.test_data_dir) / 'AAPL.csv', index=False)
+        aapl_df['timestamp'] = pd.to_datetime(aapl_df['timestamp'])
+        aapl_df.set_index('timestamp').to_parquet(Path(self.test_data_dir) / 'AAPL.parquet')
 
         fetcher = DataFetcher(mode='persistent')
         fetcher.data_dir = Path(self.test_data_dir)
@@ -73,30 +73,211 @@ class TestDataFetcher(unittest.TestCase):
         self.assertListEqual(list(data['AAPL'].columns),
                              ['open', 'high', 'low', 'close', 'volume', 'vwap', 'transactions'])
 
-        # GOOGL should not be in the data as we didn't create a CSV for it
+        # GOOGL should not be in the data as we didn't create a file for it and the API returned no bars
         self.assertNotIn('GOOGL', data)
+        mock_get_aggs.assert_awaited_once()
 
-    def test_convert_timestamp_to_date(self):
-        fetcher = DataFetcher()
-        date_str = fetcher._convert_timestamp_to_date(1609459200000)  # 2021-01-01 00:00:00 UTC
-        self.assertEqual(date_str, '2021-01-01')
+        pruned = fetcher.fetch_historical_data(
+            tickers=['AAPL'],
+            start_date='2021-01-01',
+            end_date='2021-01-02',
+            columns=['close']
+        )
+        self.assertListEqual(list(pruned['AAPL'].columns), ['close'])
+        self.assertIsInstance(pruned['AAPL'].index, pd.DatetimeIndex)
+
+    @patch.object(DataFetcher, '_get_aggs', new_callable=AsyncMock)
+    @patch.object(DataFetcher, '_fetch_grouped_daily', new_callable=AsyncMock)
+    def test_fetch_historical_data_grouped_daily(self, mock_grouped_daily, mock_get_aggs):
+        async def grouped_daily(session, date, adjusted):
+            timestamp = int(pd.Timestamp(date, tz='America/New_York').timestamp() * 1000)
+            return [
+                Bar(T='AAPL', t=timestamp, o=100, h=101, l=99, c=100.5, v=1000000, vw=100.2, n=5000),
+                Bar(T='NOT_REQUESTED', t=timestamp, o=10, h=11, l=9, c=10.5, v=1000, vw=10.2, n=50)
+            ]
+        mock_grouped_daily.side_effect = grouped_daily
+
+        tickers = ['AAPL'] + [f'TICKER{i}' for i in range(60)]
+        fetcher = DataFetcher(mode='on_demand')
+        data = fetcher.fetch_historical_data(tickers=tickers, start_date='2021-01-04', end_date='2021-01-05')
+
+        self.assertListEqual(list(data), ['AAPL'])
+        self.assertEqual(len(data['AAPL']), 2)
+        self.assertEqual(mock_grouped_daily.await_count, 2)  # one request per weekday
+        mock_get_aggs.assert_not_awaited()
+
+    @patch.object(DataFetcher, '_get_aggs', new_callable=AsyncMock)
+    @patch.object(DataFetcher, '_fetch_grouped_daily', new_callable=AsyncMock)
+    def test_fetch_historical_data_grouped_daily_falls_back_for_failed_days(self, mock_grouped_daily, mock_get_aggs):
+        async def grouped_daily(session, date, adjusted):
+            if date in ('2021-01-05', '2021-01-07'):
+                raise RuntimeError('server error')
+            timestamp = int(pd.Timestamp(date, tz='America/New_York').timestamp() * 1000)
+            return [Bar(T='AAPL', t=timestamp, o=100, h=101, l=99, c=100.5, v=1000000, vw=100.2, n=5000)]
+        mock_grouped_daily.side_effect = grouped_daily
+
+        async def get_aggs(session, ticker, from_, **kwargs):
+            if ticker != 'AAPL':
+                return []
+            timestamp = int(pd.Timestamp(from_, tz='America/New_York').timestamp() * 1000)
+            return [Bar(t=timestamp, o=101, h=102, l=100, c=101.5, v=1100000, vw=101.2, n=5500)]
+        mock_get_aggs.side_effect = get_aggs
+
+        tickers = ['AAPL'] + [f'TICKER{i}' for i in range(60)]
+        fetcher = DataFetcher(mode='on_demand')
+        data = fetcher.fetch_historical_data(tickers=tickers, start_date='2021-01-04', end_date='2021-01-08')
+
+        self.assertListEqual(data['AAPL']['close'].tolist(), [100.5, 101.5, 100.5, 101.5, 100.5])
+        self.assertEqual(mock_grouped_daily.await_count, 7)  # the two failed days are retried once
+        # Every ticker requests only the days that kept failing, not the span between them
+        requested = {(call.kwargs['from_'], call.kwargs['to']) for call in mock_get_aggs.await_args_list}
+        self.assertSetEqual(requested, {('2021-01-05', '2021-01-05'), ('2021-01-07', '2021-01-07')})
+        self.assertEqual(mock_get_aggs.await_count, 2 * len(tickers))
+
+    @patch.object(DataFetcher, '_get_aggs', new_callable=AsyncMock)
+    @patch.object(DataFetcher, '_fetch_grouped_daily', new_callable=AsyncMock)
+    def test_fetch_historical_data_grouped_daily_retries_failed_days(self, mock_grouped_daily, mock_get_aggs):
+        attempts = set()
+
+        async def grouped_daily(session, date, adjusted):
+            if date not in attempts:
+                attempts.add(date)
+                raise asyncio.TimeoutError()
+            timestamp = int(pd.Timestamp(date, tz='America/New_York').timestamp() * 1000)
+            return [Bar(T='AAPL', t=timestamp, o=100, h=101, l=99, c=100.5, v=1000000, vw=100.2, n=5000)]
+        mock_grouped_daily.side_effect = grouped_daily
+
+        tickers = ['AAPL'] + [f'TICKER{i}' for i in range(60)]
+        fetcher = DataFetcher(mode='on_demand')
+        data = fetcher.fetch_historical_data(tickers=tickers, start_date='2021-01-04', end_date='2021-01-05')
+
+        self.assertEqual(len(data['AAPL']), 2)
+        mock_get_aggs.assert_not_awaited()  # transient failures never reach the per-ticker endpoint
+
+    @patch.object(DataFetcher, '_get_aggs', new_callable=AsyncMock, side_effect=RuntimeError('server error'))
+    @patch.object(DataFetcher, '_fetch_grouped_daily', new_callable=AsyncMock)
+    def test_fetch_historical_data_grouped_daily_keeps_partial_data(self, mock_grouped_daily, mock_get_aggs):
+        async def grouped_daily(session, date, adjusted):
+            if date == '2021-01-05':
+                raise RuntimeError('server error')
+            return [Bar(T='AAPL', t=1609736400000, o=100, h=101, l=99, c=100.5, v=1000000, vw=100.2, n=5000)]
+        mock_grouped_daily.side_effect = grouped_daily
+
+        tickers = ['AAPL'] + [f'TICKER{i}' for i in range(60)]
+        fetcher = DataFetcher(mode='persistent')
+        fetcher.data_dir = Path(self.test_data_dir)
+        data = fetcher.fetch_historical_data(tickers=tickers, start_date='2021-01-04', end_date='2021-01-05')
+
+        self.assertListEqual(data['AAPL']['close'].tolist(), [100.5])  # the good day survives the failed fallback
+        cached = pd.read_parquet(Path(self.test_data_dir) / 'AAPL.parquet')
+        self.assertEqual(len(cached), 1)
+        self.assertNotIn(FETCHED_RANGE_ATTR, cached.attrs)  # so the missing day is requested again next time
+
+    def test_decode_aggs_response(self):
+        body = b'{"ticker": "AAPL", "status": "OK", "results": [{"t": 1609459200000, "o": 100, "h": 101, "l": 99, ' \
+               b'"c": 100.5, "v": 1000000}]}'
+        bars = AGGS_DECODER.decode(body).results
+        self.assertEqual(len(bars), 1)
+        self.assertEqual(bars[0].c, 100.5)
+        self.assertEqual(bars[0].n, 0)  # missing fields fall back to their defaults
+        self.assertEqual(AGGS_DECODER.decode(b'{"status": "OK", "resultsCount": 0}').results, [])
+
+    def test_bars_to_frame(self):
+        bars = [Bar(t=1609736400000, o=100, h=101, l=99, c=100.5, v=1000000, vw=100.2, n=5000)]  # 2021-01-04 05:00 UTC
+        df = DataFetcher._bars_to_frame(bars)
+        self.assertIsInstance(df.index, pd.DatetimeIndex)
+        self.assertEqual(df.index[0], pd.Timestamp('2021-01-04'))  # session date in New York
+        self.assertEqual(df.loc[df.index[0], 'close'], 100.5)
+
+        intraday = DataFetcher._bars_to_frame(bars, timespan='minute')
+        self.assertEqual(intraday.index[0], pd.Timestamp('2021-01-04 00:00'))
 
-    @patch('src.data.data_fetcher.RESTClient')
-    def test_fetch_and_save_tickers(self, mock_rest_client):
+    def test_reduce_mem_keeps_values_exact(self):
+        df = _reduce_mem(pd.DataFrame({'close': [123.45, np.nan], 'vwap': [123.41, 123.47],
+                                       'volume': [123456789.0, 1.0], 'transactions': [5, 6]}))
+        self.assertEqual(df['close'].dtype, np.float32)  # prices are downcast even though 123.45 is not exact
+        self.assertEqual(df['vwap'].dtype, np.float32)
+        self.assertEqual(df['volume'].dtype, np.float64)  # 123456789 would round to 123456792 in float32
+        self.assertEqual(df['volume'].iloc[0], 123456789.0)
+        self.assertEqual(df['transactions'].dtype, np.int16)
+        self.assertEqual(_reduce_mem(pd.DataFrame({'volume': [1000000.0, 1100000.0]}))['volume'].dtype, np.float32)
+
+    @patch.object(DataFetcher, '_get_aggs', new_callable=AsyncMock)
+    def test_fetch_historical_data_persistent_fetches_only_missing_dates(self, mock_get_aggs):
+        mock_get_aggs.return_value = [
+            Bar(t=1609909200000, o=103, h=104, l=102, c=103.5, v=1200000, vw=103.2, n=6000),  # 2021-01-06
+            Bar(t=1609995600000, o=104, h=105, l=103, c=104.5, v=1300000, vw=104.2, n=6500)  # 2021-01-07
+        ]
+        pd.DataFrame({
+            'open': [100.0, 101.0], 'high': [102.0, 103.0], 'low': [99.0, 100.0], 'close': [101.0, 102.0],
+            'volume': [1000000.0, 1100000.0], 'vwap': [100.5, 101.5], 'transactions': [5000, 5500]
+        }, index=pd.DatetimeIndex(['2021-01-04', '2021-01-05'], name='timestamp')).to_parquet(
+            Path(self.test_data_dir) / 'AAPL.parquet')
+
+        fetcher = DataFetcher(mode='persistent')
+        fetcher.data_dir = Path(self.test_data_dir)
+
+        data = fetcher.fetch_historical_data(tickers=['AAPL'], start_date='2021-01-04', end_date='2021-01-07',
+                                             columns=['close'])
+
+        mock_get_aggs.assert_awaited_once()
+        self.assertEqual(mock_get_aggs.await_args.kwargs['from_'], '2021-01-06')
+        self.assertListEqual(data['AAPL']['close'].tolist(), [101.0, 102.0, 103.5, 104.5])
+        self.assertEqual(len(pd.read_parquet(Path(self.test_data_dir) / 'AAPL.parquet')), 4)
+
+    @patch.object(DataFetcher, '_get_aggs', new_callable=AsyncMock, return_value=[])
+    def test_fetch_historical_data_persistent_skips_ranges_fetched_empty(self, mock_get_aggs):
+        pd.DataFrame({
+            'open': [103.0, 104.0], 'high': [104.0, 105.0], 'low': [102.0, 103.0], 'close': [103.5, 104.5],
+            'volume': [1200000.0, 1300000.0], 'vwap': [103.2, 104.2], 'transactions': [6000, 6500]
+        }, index=pd.DatetimeIndex(['2021-01-06', '2021-01-07'], name='timestamp')).to_parquet(
+            Path(self.test_data_dir) / 'AAPL.parquet')  # e.g. listed on 2021-01-06
+
+        fetcher = DataFetcher(mode='persistent')
+        fetcher.data_dir = Path(self.test_data_dir)
+
+        for _ in range(2):
+            data = fetcher.fetch_historical_data(tickers=['AAPL'], start_date='2021-01-04', end_date='2021-01-07')
+
+        mock_get_aggs.assert_awaited_once()  # the empty range before the listing is only requested on the first run
+        self.assertEqual(len(data['AAPL']), 2)
+
+    @patch.object(DataFetcher, '_get_aggs', new_callable=AsyncMock, return_value=[])
+    def test_fetch_historical_data_migrates_legacy_csv(self, mock_get_aggs):
+        pd.DataFrame({
+            'timestamp': ['2021-01-01', '2021-01-02'],
+            'open': [100.0, 101.0],
+            'high': [102.0, 103.0],
+            'low': [99.0, 100.0],
+            'close': [101.0, 102.0],
+            'volume': [1000000.0, 1100000.0],
+            'vwap': [100.5, 101.5],
+            'transactions': [5000, 5500]
+        }).to_csv(Path(self.test_data_dir) / 'AAPL.csv', index=False)
+
+        fetcher = DataFetcher(mode='persistent')
+        fetcher.data_dir = Path(self.test_data_dir)
+
+        data = fetcher.fetch_historical_data(tickers=['AAPL'], start_date='2021-01-01', end_date='2021-01-02')
+
+        self.assertEqual(len(data['AAPL']), 2)
+        self.assertIsInstance(data['AAPL'].index, pd.DatetimeIndex)
+        self.assertTrue(Path(self.test_data_dir, 'AAPL.parquet').exists())
+        mock_get_aggs.assert_not_awaited()
+
+    @patch.object(DataFetcher, '_get_aggs', new_callable=AsyncMock)
+    def test_fetch_and_save_tickers(self, mock_get_aggs):
         # Mock the Polygon API response
-        mock_aggs = [
-            MagicMock(timestamp=1609459200000, open=100, high=101, low=99, close=100.5, volume=1000000, vwap=100.2,
-                      transactions=5000),
-            MagicMock(timestamp=1609545600000, open=100.5, high=102, low=100, close=101.5, volume=1100000, vwap=101.0,
-                      transactions=5500)
+        mock_get_aggs.return_value = [
+            Bar(t=1609459200000, o=100, h=101, l=99, c=100.5, v=1000000, vw=100.2, n=5000),
+            Bar(t=1609545600000, o=100.5, h=102, l=100, c=101.5, v=1100000, vw=101.0, n=5500)
         ]
-        mock_rest_client.return_value.get_aggs.return_value = mock_aggs
 
         fetcher = DataFetcher(mode='persistent')
         fetcher.data_dir = Path(self.test_data_dir)
 
         historical_data = {}
-        fetcher._fetch_and_save_tickers(
+        asyncio.run(fetcher._fetch_and_save_tickers(
             tickers=['AAPL'],
             start_date='2021-01-01',
             end_date='2021-01-02',
@@ -104,11 +285,17 @@ class TestDataFetcher(unittest.TestCase):
             limit=50000,
             adjusted=True,
             historical_data=historical_data
-        )
+        ))
 
         self.assertIn('AAPL', historical_data)
         self.assertEqual(len(historical_data['AAPL']), 2)
-        self.assertTrue(Path(self.test_data_dir, 'AAPL.csv').exists())
+        self.assertTrue(Path(self.test_data_dir, 'AAPL.parquet').exists())
+
+    def test_rate_limiter_syncs_from_headers(self):
+        limiter = RateLimiter(rate=5)
+        limiter.update({'X-RateLimit-Limit': '100', 'X-RateLimit-Remaining': '42'})
+        self.assertEqual(limiter.capacity, 100)
+        self.assertEqual(limiter.tokens, 42)
 
 
 if __name__ == '__main__':
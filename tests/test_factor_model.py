@@ -1,9 +1,12 @@
 import unittest
+from unittest.mock import patch
+import numpy as np
 import pandas as pd
 from src.models.factor_model import FactorModel
-from src.utils.data_preparation import prepare_returns_data
+from src.utils.data_preparation import prepare_returns_data, PriceMatrix
 from src.utils.portfolio_construction import construct_equal_weight_portfolio
-from src.utils.performance_evaluation import PortfolioPerformance
+from src.utils.backtesting import backtest_strategy
+from src.utils.performance_evaluation import PortfolioPerformance, compute_metrics_batch
 
 
 class TestFactorModel(unittest.TestCase):
@@ -39,12 +42,126 @@ class TestFactorModel(unittest.TestCase):
         self.assertEqual(exposures.shape, (2, 4))  # 2 stocks, 4 factors
         self.assertNotIn(self.benchmark_ticker, exposures.index)
 
+    def test_calculate_factor_exposures_from_price_matrix(self):
+        model = FactorModel(['Market', 'Size', 'Value', 'Momentum'], benchmark_ticker=self.benchmark_ticker)
+        prices = PriceMatrix.from_frames(self.sample_data)
+        exposures = model.calculate_factor_exposures(prices)
+        self.assertEqual(exposures.shape, (2, 4))
+        self.assertNotIn(self.benchmark_ticker, exposures.index)
+
+    def test_calculate_factor_exposures_staggered_listings(self):
+        rng = np.random.default_rng(1)
+        index = pd.bdate_range('2023-01-02', periods=60)
+        data = {
+            f'STOCK{i}': pd.DataFrame({'close': 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 60)))}, index=index)
+            for i in range(5)
+        }
+        # A late listing leaves NaN returns at the start; dropping incomplete rows would discard 30 dates for all
+        data['STOCK0'] = data['STOCK0'].iloc[30:]
+        model = FactorModel(['Market'], benchmark_ticker=self.benchmark_ticker, fp32=False)
+        exposures = model.calculate_factor_exposures(data)
+
+        returns = pd.DataFrame({ticker: frame['close'] for ticker, frame in data.items()}).pct_change(fill_method=None)
+        market = returns.mean(axis=1)
+        for ticker in ['STOCK0', 'STOCK1']:
+            overlap = returns[ticker].notna() & market.notna()
+            r, m = returns.loc[overlap, ticker], market[overlap]
+            expected = np.cov(r, m)[0, 1] / np.var(m, ddof=1)
+            self.assertAlmostEqual(exposures.loc[ticker, 'Market'], expected, places=10)
+
+    def test_momentum_uses_one_year_lookback(self):
+        index = pd.bdate_range('2023-01-02', periods=300)
+        data = {
+            'AAPL': pd.DataFrame({'close': np.linspace(100, 200, 300)}, index=index),
+            'GOOGL': pd.DataFrame({'close': np.linspace(50, 60, 300)}, index=index)
+        }
+        model = FactorModel(['Market', 'Size', 'Value', 'Momentum'], benchmark_ticker=self.benchmark_ticker, fp32=False)
+        exposures = model.calculate_factor_exposures(data)
+        closes = data['AAPL']['close']
+        self.assertAlmostEqual(exposures.loc['AAPL', 'Momentum'], closes.iloc[-1] / closes.iloc[-252] - 1)
+        self.assertAlmostEqual(exposures.loc['AAPL', 'Size'], np.log(closes.iloc[-1]))
+
     def test_estimate_factor_returns(self):
         model = FactorModel(['Market', 'Size', 'Value', 'Momentum'], benchmark_ticker=self.benchmark_ticker)
         returns = model.estimate_factor_returns(self.sample_data)
         self.assertIsInstance(returns, pd.DataFrame)
         self.assertEqual(returns.shape[1], 4)  # 4 factors
 
+    def test_fp32_matches_fp64(self):
+        rng = np.random.default_rng(0)
+        index = pd.bdate_range('2023-01-02', periods=120)
+        data = {
+            f'STOCK{i}': pd.DataFrame({'close': rng.uniform(10, 500) * np.exp(np.cumsum(rng.normal(0, 0.02, 120)))},
+                                      index=index)
+            for i in range(40)
+        }
+        factors = ['Market', 'Size', 'Value', 'Momentum']
+        model_fp32 = FactorModel(factors, benchmark_ticker=self.benchmark_ticker)
+        model_fp64 = FactorModel(factors, benchmark_ticker=self.benchmark_ticker, fp32=False)
+
+        exposures_fp32 = model_fp32.calculate_factor_exposures(data)
+        exposures_fp64 = model_fp64.calculate_factor_exposures(data)
+        self.assertEqual(exposures_fp32.dtypes.iloc[0], np.float32)
+        np.testing.assert_allclose(exposures_fp32, exposures_fp64, rtol=1e-4, atol=1e-6)
+
+        returns_fp32 = model_fp32.estimate_factor_returns(data)
+        returns_fp64 = model_fp64.estimate_factor_returns(data)
+        np.testing.assert_allclose(returns_fp32, returns_fp64, rtol=1e-3, atol=1e-5)
+
+    def test_fit_window_matches_frame_api(self):
+        factors = ['Market', 'Size', 'Value', 'Momentum']
+        prices = PriceMatrix.from_frames(self.sample_data, dtype=np.float64).drop(self.benchmark_ticker)
+        returns = prices.to_frame().pct_change(fill_method=None).to_numpy()
+        exposures, factor_returns = FactorModel(factors, fp32=False).fit_window(prices, returns)
+
+        model = FactorModel(factors, fp32=False)
+        pd.testing.assert_frame_equal(exposures, model.calculate_factor_exposures(self.sample_data))
+        pd.testing.assert_frame_equal(factor_returns, model.estimate_factor_returns(self.sample_data))
+
+        market = FactorModel.market_returns(returns)
+        exposures_from_market, _ = FactorModel(factors, fp32=False).fit_window(prices, returns, market=market)
+        pd.testing.assert_frame_equal(exposures_from_market, exposures)
+
+    def test_update_window_matches_direct_betas(self):
+        rng = np.random.default_rng(2)
+        returns = rng.normal(0, 0.02, (100, 6))
+        returns[:30, 0] = np.nan  # late listing
+        returns[50, 3] = np.nan
+        prices = np.ones_like(returns)
+        tickers = pd.Index([f'STOCK{i}' for i in range(6)])
+        model = FactorModel(['Market'], fp32=False)
+
+        betas = model.update_window(returns[0:40])
+        for start in range(10, 61, 10):
+            betas = model.update_window(returns[start + 30:start + 40], returns[start - 10:start])
+            expected = model._fit_exposures(prices[start:start + 40], returns[start:start + 40], tickers)['Market']
+            np.testing.assert_allclose(betas, expected, rtol=1e-9)
+
+    def test_allocate_kernels_agree(self):
+        from src.models.factor_model import _allocate, _allocate_numpy
+        exposures = np.random.default_rng(3).normal(size=(50, 4))
+        exposures[5, 2] = np.nan
+        exposures[:, 3] = 0  # nothing to allocate to the last factor
+        target = np.array([1.0, -0.2, 0.5, 0.3])
+        portfolio, allocated = _allocate(exposures, target)
+        portfolio_numpy, allocated_numpy = _allocate_numpy(exposures, target)
+        np.testing.assert_allclose(portfolio, portfolio_numpy, atol=1e-12)
+        np.testing.assert_array_equal(allocated, allocated_numpy)
+
+    def test_backtest_uses_model_dtype(self):
+        model = FactorModel(['Market', 'Size', 'Value', 'Momentum'], fp32=False)
+        fit_window = model.fit_window
+        dtypes = []
+
+        def record_dtypes(prices, returns, *args, **kwargs):
+            dtypes.append((prices.close.dtype, returns.dtype))
+            return fit_window(prices, returns, *args, **kwargs)
+
+        with patch.object(model, 'fit_window', side_effect=record_dtypes):
+            backtest_strategy(self.sample_data, model, rebalance_frequency='D', window_size=3)
+        self.assertTrue(dtypes)
+        self.assertTrue(all(dtype == (np.float64, np.float64) for dtype in dtypes))
+
     def test_construct_portfolio(self):
         model = FactorModel(['Market', 'Size', 'Value', 'Momentum'], benchmark_ticker=self.benchmark_ticker)
         target_exposures = {'Market': 1.0, 'Size': -0.2, 'Value': 0.5, 'Momentum': 0.3}
@@ -74,6 +191,87 @@ class TestFactorModel(unittest.TestCase):
         self.assertIn('Sharpe Ratio', summary)
         self.assertIn('Max Drawdown', summary)
 
+    def test_portfolio_performance_matches_pandas_formulas(self):
+        rng = np.random.default_rng(0)
+        index = pd.date_range('2023-01-01', periods=300)
+        portfolio_returns = pd.Series(rng.normal(0.0005, 0.01, 300), index=index)
+        benchmark_returns = pd.Series(rng.normal(0.0004, 0.009, 300), index=index)
+        portfolio_returns.iloc[[3, 50]] = np.nan
+        benchmark_returns.iloc[[7]] = np.nan
+        performance = PortfolioPerformance(portfolio_returns, benchmark_returns)
+
+        daily_rf = performance.daily_risk_free_rate
+        excess = portfolio_returns - daily_rf
+        active = portfolio_returns - benchmark_returns
+        downside = excess[excess < 0]
+        self.assertAlmostEqual(performance.sharpe_ratio(), np.sqrt(252) * excess.mean() / excess.std())
+        self.assertAlmostEqual(performance.information_ratio(), np.sqrt(252) * active.mean() / active.std())
+        self.assertAlmostEqual(performance.tracking_error(), np.sqrt(252) * active.std())
+        self.assertAlmostEqual(performance.sortino_ratio(),
+                               np.sqrt(252) * excess.mean() / np.sqrt((downside ** 2).mean()))
+        wealth = (1 + portfolio_returns).cumprod()
+        self.assertAlmostEqual(performance.max_drawdown(), (wealth / wealth.cummax() - 1).min())
+        self.assertAlmostEqual(performance.total_return(), (1 + portfolio_returns).prod() - 1)
+        benchmark_excess = benchmark_returns - daily_rf
+        covariance = (excess * benchmark_excess).mean() - excess.mean() * benchmark_excess.mean()
+        beta = covariance / benchmark_excess.var(ddof=0)
+        alpha, fitted_beta = performance.alpha_beta()
+        self.assertAlmostEqual(fitted_beta, beta)
+        self.assertAlmostEqual(alpha, (excess.mean() - beta * benchmark_excess.mean()) * 252)
+
+    def test_total_return_below_minus_one(self):
+        index = pd.date_range('2023-01-01', periods=4)
+        portfolio_returns = pd.Series([0.1, -1.5, np.nan, 0.1], index=index)
+        performance = PortfolioPerformance(portfolio_returns, pd.Series(0.0, index=index))
+        self.assertAlmostEqual(performance.total_return(), (1 + portfolio_returns).prod() - 1)  # -1.605, not a gain
+
+    def test_performance_fp32_matches_fp64(self):
+        rng = np.random.default_rng(5)
+        index = pd.date_range('2023-01-01', periods=500)
+        portfolio_returns = pd.Series(rng.normal(0.0005, 0.01, 500), index=index)
+        benchmark_returns = pd.Series(rng.normal(0.0004, 0.009, 500), index=index)
+        summary_fp32 = PortfolioPerformance(portfolio_returns, benchmark_returns, fp32=True).summary()
+        summary_fp64 = PortfolioPerformance(portfolio_returns, benchmark_returns).summary()
+        self.assertEqual(summary_fp32['Total Return'], summary_fp64['Total Return'])
+        np.testing.assert_allclose(list(summary_fp32.values()), list(summary_fp64.values()), rtol=1e-4)
+
+    def test_compute_metrics_batch_matches_summary(self):
+        rng = np.random.default_rng(6)
+        index = pd.date_range('2023-01-01', periods=250)
+        portfolio_returns = pd.DataFrame(rng.normal(0.0005, 0.01, (250, 8)), index=index)
+        portfolio_returns.iloc[3, 2] = np.nan
+        benchmark_returns = pd.Series(rng.normal(0.0004, 0.009, 250), index=index)
+        metrics = compute_metrics_batch(portfolio_returns, benchmark_returns)
+        self.assertEqual(metrics.shape, (8, 10))
+        for column in portfolio_returns.columns:
+            summary = PortfolioPerformance(portfolio_returns[column], benchmark_returns).summary()
+            self.assertEqual(list(metrics.columns), list(summary))
+            np.testing.assert_allclose(metrics.loc[column].to_numpy(), list(summary.values()), rtol=1e-9)
+
+    def test_compute_metrics_batch_total_return_below_minus_one(self):
+        index = pd.date_range('2023-01-01', periods=4)
+        portfolio_returns = pd.DataFrame({'wiped_out': [0.1, -1.5, np.nan, 0.1], 'normal': [0.1, np.nan, -0.2, 0.1]},
+                                         index=index)
+        benchmark_returns = pd.Series([0.01, -0.02, 0.005, 0.0], index=index)
+        expected = ((1 + portfolio_returns).prod() - 1).to_numpy()
+        for numba_available in (True, False):
+            with patch('src.utils.performance_evaluation.NUMBA_AVAILABLE', numba_available):
+                metrics = compute_metrics_batch(portfolio_returns, benchmark_returns)
+            np.testing.assert_allclose(metrics['Total Return'].to_numpy(), expected, rtol=1e-12)
+
+    def test_performance_kernels_agree(self):
+        from src.utils.performance_evaluation import (_moments_kernel, _moments_numpy, _max_drawdown_kernel,
+                                                      _max_drawdown_numpy, cumulative_wealth)
+        rng = np.random.default_rng(4)
+        portfolio_returns = rng.normal(0.0005, 0.01, 200)
+        benchmark_returns = rng.normal(0.0004, 0.009, 200)
+        portfolio_returns[[2, 30]] = np.nan
+        benchmark_returns[9] = np.nan
+        np.testing.assert_allclose(_moments_kernel(portfolio_returns, benchmark_returns, 1e-4),
+                                   _moments_numpy(portfolio_returns, benchmark_returns, 1e-4), rtol=1e-9)
+        self.assertAlmostEqual(_max_drawdown_kernel(portfolio_returns),
+                               _max_drawdown_numpy(cumulative_wealth(portfolio_returns)))
+
 
 if __name__ == '__main__':
     unittest.main()